@@ -1,13 +1,37 @@
 import os
+import functools
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 
-load_dotenv()
+@dataclass(frozen=True)
+class Settings:
+    GOOGLE_API_KEY: Optional[str]
+    COHERE_API_KEY: Optional[str]
+    LLM_MODEL: str
+    API_KEY: Optional[str]
+    ENDPOINT: Optional[str]
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-llm_model = os.getenv("LLM_MODEL", "gemini-2.0-flash")
-API_KEY= os.getenv("API_KEY")
-ENDPOINT = os.getenv("ENDPOINT")
+@functools.lru_cache(maxsize=1)
+def get() -> Settings:
+    """返回进程内唯一的配置对象，.env 和环境变量只在第一次调用时读取。"""
+    # lru_cache 保证进程内只解析一次 .env，热重载工具时不再重复读取磁盘
+    load_dotenv()
+    return Settings(
+        GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY"),
+        COHERE_API_KEY=os.getenv("COHERE_API_KEY"),
+        LLM_MODEL=os.getenv("LLM_MODEL", "gemini-2.0-flash"),
+        API_KEY=os.getenv("API_KEY"),
+        ENDPOINT=os.getenv("ENDPOINT"),
+    )
+
+_ENV = get()
+
+GOOGLE_API_KEY = _ENV.GOOGLE_API_KEY
+COHERE_API_KEY = _ENV.COHERE_API_KEY
+llm_model = _ENV.LLM_MODEL
+API_KEY = _ENV.API_KEY
+ENDPOINT = _ENV.ENDPOINT
 
 # 服务器端口
 SERVER_PORT = 8000
@@ -0,0 +1,31 @@
+import functools
+
+@functools.lru_cache(maxsize=1)
+def _shared_http_clients():
+    """
+    所有 LLM 客户端共享的 httpx 连接池（同步 + 异步）。
+    不同工具之间复用 keep-alive 连接，TLS 握手只需进行一次。
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+    timeout = httpx.Timeout(600.0, connect=10.0)
+    return (
+        httpx.Client(limits=limits, timeout=timeout),
+        httpx.AsyncClient(limits=limits, timeout=timeout),
+    )
+
+@functools.lru_cache(maxsize=8)
+def get_openai(model: str, api_key: str, base_url: str, temperature: float):
+    """按参数缓存 ChatOpenAI 客户端，所有实例共用同一个 HTTP 连接池。"""
+    from langchain_openai import ChatOpenAI
+
+    http_client, http_async_client = _shared_http_clients()
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
@@ -9,18 +9,20 @@ logger.add(
     sys.stdout,
     colorize=True,
     format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="INFO"
+    level="INFO",
+    enqueue=True  # 通过后台线程写日志，不阻塞工具执行
 )
 
 # 添加一个文件处理器，用于将日志记录到文件
 logger.add(
     "logs/app.log",
-    rotation="10 MB",  # 每10MB创建一个新文件
+    rotation="50 MB",  # 每50MB创建一个新文件，摊薄轮转和压缩的开销
     retention=False,  # 禁用日志过期，永久保存
-    compression="zip",  # 压缩旧的日志文件
+    compression="gz",  # 使用 gzip 压缩旧的日志文件，比 zip 更省 CPU
     format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
     level="DEBUG",
-    encoding="utf-8"
+    encoding="utf-8",
+    enqueue=True  # 文件写入与压缩在后台线程完成
 )
 
 # 导出配置好的 logger
@@ -1,16 +1,27 @@
 import os
-import glob
 import importlib.util
-import time
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+import sys
+import threading
+from watchdog.events import PatternMatchingEventHandler
 from logger import log  # 导入配置好的 logger
 
+# Linux 下显式使用 inotify 内核推送通知，避免 stat() 轮询；其它平台交给 watchdog 自动选择
+if sys.platform.startswith("linux"):
+    try:
+        from watchdog.observers.inotify import InotifyObserver as Observer
+    except ImportError:
+        from watchdog.observers.polling import PollingObserver as Observer
+else:
+    from watchdog.observers import Observer
+
 os.environ["FASTMCP_PORT"] = "8000"
 from mcp.server.fastmcp import FastMCP
 
 # 初始化 MCP 服务器实例
 mcp = FastMCP("Demo")
+# 以脚本方式运行时，让工具模块中的 `from server import mcp` 拿到同一个模块，
+# 否则 server.py 会在加载工具时被再次作为模块导入执行
+sys.modules.setdefault("server", sys.modules[__name__])
 
 # 定义工具目录
 # 不会热重载的静态工具目录（例如你的元工具）
@@ -18,6 +29,105 @@ STATIC_TOOLS_DIR = "static_tools"
 # 会被热重载的工具目录（例如 AI 生成的工具）
 HOT_RELOAD_TOOLS_DIR = "tools"     
 
+# 已加载的工具模块缓存：文件绝对路径 -> (mtime_ns, size, 模块对象)
+# 用于跳过未修改文件的重复执行，以及按文件精确卸载/重载
+_module_cache = {}
+_module_cache_lock = threading.Lock()
+# 串行化热重载，避免多次重载交错执行
+_reload_lock = threading.Lock()
+
+def _get_tool_remover():
+    """
+    返回注销单个工具的函数；当前 mcp 版本无法注销工具时返回 None。
+    优先使用 ToolManager.remove_tool，旧版本则直接从工具注册表中移除。
+    """
+    tool_manager = getattr(mcp, "_tool_manager", None)
+    remove_tool = getattr(tool_manager, "remove_tool", None)
+    if remove_tool is not None:
+        return remove_tool
+    tools = getattr(tool_manager, "_tools", None)
+    if isinstance(tools, dict):
+        return tools.pop
+    return None
+
+def _is_module_unchanged(path: str, st: os.stat_result) -> bool:
+    """文件的 mtime 和大小与上次加载时一致则视为未修改。"""
+    cached = _module_cache.get(os.path.abspath(path))
+    return cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size)
+
+def _load_tool_module(dir_path: str, path: str, st: os.stat_result = None):
+    """执行单个工具文件，并记录该模块注册到 mcp 的工具名称。"""
+    if st is None:
+        st = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    # 使用稳定的模块名，并在重载前移除旧模块，
+    # 让旧的代码对象可以被回收，而不是每次重载都在 sys.modules 中遗留一份
+    module_name = f"{dir_path}.{name}"
+    sys.modules.pop(module_name, None)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = mod
+    try:
+        spec.loader.exec_module(mod)
+    except BaseException:
+        sys.modules.pop(module_name, None)
+        raise
+
+    # 通过工具函数所属模块反查本文件注册的工具，供之后精确注销
+    # 并发加载时其它线程可能正在注册工具，先取快照再遍历
+    tools = list(getattr(getattr(mcp, "_tool_manager", None), "_tools", {}).items())
+    mod._mcp_tools = [
+        tool_name for tool_name, tool in tools
+        if getattr(getattr(tool, "fn", None), "__module__", None) == module_name
+    ]
+    # 同名工具已由其它文件注册时，FastMCP 会保留先注册的那个，这里明确提示被忽略的定义
+    owners = {tool_name: getattr(getattr(tool, "fn", None), "__module__", None) for tool_name, tool in tools}
+    for attr, value in vars(mod).items():
+        if (
+            callable(value)
+            and getattr(value, "__module__", None) == module_name
+            and owners.get(attr) not in (None, module_name)
+        ):
+            log.warning(f"工具 {attr} 已由 {owners[attr]} 注册，{path} 中的同名定义被忽略。")
+    with _module_cache_lock:
+        _module_cache[os.path.abspath(path)] = (st.st_mtime_ns, st.st_size, mod)
+    return mod
+
+def _unload_tool_module(path: str) -> bool:
+    """注销指定文件之前注册的全部工具。返回 False 表示 mcp 不支持注销。"""
+    remove_tool = _get_tool_remover()
+    if remove_tool is None:
+        return False
+    with _module_cache_lock:
+        _, _, mod = _module_cache.pop(os.path.abspath(path), (None, None, None))
+    for tool_name in getattr(mod, "_mcp_tools", []):
+        try:
+            remove_tool(tool_name)
+        except Exception as e:
+            log.warning(f"注销工具 {tool_name} 失败: {e}")
+    return True
+
+def unregister_module_tools(module_name: str) -> list:
+    """
+    注销工具函数定义在 module_name 模块中的全部工具，返回被注销的工具名。
+    用于清理不经过 _load_tool_module 的临时导入（例如元工具测试生成代码时的导入），
+    否则残留的注册会占住工具名，之后 tools/ 中的同名文件既无法注册也无法热重载。
+    """
+    remove_tool = _get_tool_remover()
+    if remove_tool is None:
+        return []
+    tools = list(getattr(getattr(mcp, "_tool_manager", None), "_tools", {}).items())
+    removed = []
+    for tool_name, tool in tools:
+        if getattr(getattr(tool, "fn", None), "__module__", None) != module_name:
+            continue
+        try:
+            remove_tool(tool_name)
+            removed.append(tool_name)
+        except Exception as e:
+            log.warning(f"注销工具 {tool_name} 失败: {e}")
+    return removed
+
 def load_tools_from_dir(dir_path: str):
     """
     从指定目录加载工具模块。
@@ -29,59 +139,106 @@ def load_tools_from_dir(dir_path: str):
         return
 
     log.info(f"正在从以下目录加载工具: {full_dir}")
-    for path in glob.glob(os.path.join(full_dir, "*.py")):
-        name = os.path.splitext(os.path.basename(path))[0]
-        if name.startswith("_"):
-            continue  # 忽略私有文件 (例如 __init__.py)
+    # scandir 的 DirEntry 会缓存 stat 结果，之后的 mtime 检查无需再次调用 os.stat
+    # 忽略私有文件 (例如 __init__.py)
+    with os.scandir(full_dir) as it:
+        entries = [e for e in it if e.is_file() and e.name.endswith(".py") and not e.name.startswith("_")]
 
+    def _load_one(entry: os.DirEntry):
+        path = entry.path
+        name = os.path.splitext(entry.name)[0]
         try:
-            # 创建一个唯一的模块名来避免重载时的冲突
-            # 这对于 Python 的导入系统识别变化至关重要
-            module_name = f"{dir_path}.{name}.{time.time_ns()}" 
-            spec = importlib.util.spec_from_file_location(module_name, path)
-            mod = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(mod)
+            st = entry.stat()
+            if _is_module_unchanged(path, st):
+                log.debug(f"工具模块未变化，跳过加载: {dir_path}/{name}.py")
+                return
+            _load_tool_module(dir_path, path, st)
             log.success(f"成功加载工具模块: {dir_path}/{name}.py")
         except Exception as e:
             log.error(f"加载 {dir_path}/{name}.py 失败: {e}")
 
+    # 逐个串行加载：工具模块首次导入会连带导入 pydantic、langchain 等存在循环导入的重型库，
+    # 多线程并发导入可能拿到尚未初始化完成的模块，导致偶发的导入错误。
+    # 文件的 stat 结果已由 scandir 缓存，mtime 未变的模块直接跳过，无需再次执行
+    for entry in entries:
+        _load_one(entry)
+
 ### 热重载事件处理器 (Watchdog)
 
-class ToolReloaderHandler(FileSystemEventHandler):
+# 只有会改变文件内容或存在性的事件才触发重载；opened / closed_no_write 等只读访问事件
+# （包括重载时 exec_module 自己读取文件）会被忽略，否则每次保存都会引出第二轮重载
+_RELOAD_EVENT_TYPES = frozenset({"created", "modified", "moved", "deleted", "closed"})
+
+class ToolReloaderHandler(PatternMatchingEventHandler):
     def __init__(self, mcp_instance: FastMCP, hot_reload_dir: str):
-        super().__init__()
+        # 只订阅 Python 文件的事件；目录、字节码缓存和编辑器隐藏/交换文件由 watchdog 直接过滤，
+        # 不会进入 on_any_event
+        super().__init__(
+            patterns=["*.py"],
+            ignore_patterns=["*/__pycache__/*", "*.pyc", ".*"],
+            ignore_directories=True,
+        )
         self.mcp_instance = mcp_instance
         self.hot_reload_dir = hot_reload_dir
-        self.last_reload_time = time.time()
-        # 防抖时间，防止单次保存操作触发多次重载
-        self.reload_debounce_seconds = 0.5 
+        self.full_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), hot_reload_dir))
+        # 防抖窗口：窗口内到达的所有事件只会在窗口结束后触发一次重载
+        self.reload_debounce_seconds = 0.25
+        self._pending = None  # 尚未触发的重载定时器
+        self._changed = set()  # 防抖窗口内发生变化的文件
+        self._lock = threading.Lock()
 
     def on_any_event(self, event):
-        # 只关心 Python 文件的创建、修改或删除事件
-        if event.is_directory:
+        if event.event_type not in _RELOAD_EVENT_TYPES:
             return
-        if not event.src_path.endswith(".py"):
-            return
-        
-        # 防抖处理：在短时间内只进行一次重载
-        current_time = time.time()
-        if current_time - self.last_reload_time < self.reload_debounce_seconds:
+        log.debug(f"检测到 {event.src_path} 文件变化")
+        # 尾沿防抖：每个新事件都重置定时器，批量保存或 git pull 只触发一次重载
+        with self._lock:
+            self._changed.add(os.path.abspath(event.src_path))
+            dest_path = getattr(event, "dest_path", "")
+            if dest_path:
+                self._changed.add(os.path.abspath(dest_path))
+            if self._pending is not None:
+                self._pending.cancel()
+            self._pending = threading.Timer(self.reload_debounce_seconds, self._do_reload)
+            self._pending.daemon = True
+            self._pending.start()
+
+    def _do_reload(self):
+        with self._lock:
+            self._pending = None
+            changed, self._changed = self._changed, set()
+
+        if _get_tool_remover() is None:
+            log.warning("当前 mcp 版本不支持注销工具，无法热重载，请重启服务器以应用修改。")
             return
-        
-        log.info(f"检测到 {event.src_path} 文件变化，正在重载工具...")
-        self.last_reload_time = current_time
-
-        # 执行重载逻辑：
-        # 最简单的方法是重新初始化 FastMCP 实例，这样会清除所有旧的工具注册。
-        # 对于生产环境，如果 MCP 实例维护了其他重要状态，可能需要更精细的
-        # unregister/re-register 机制 (例如 mcp.unregister_tool(tool_name))。
-        global mcp
-        log.info("重新初始化 FastMCP 以清除旧工具...")
-        mcp = FastMCP("Demo") # 重新创建 FastMCP 实例
-
-        # load_tools_from_dir(STATIC_TOOLS_DIR)
-        load_tools_from_dir(HOT_RELOAD_TOOLS_DIR)
-        log.success("--- 工具重载成功！ ---")
+
+        log.info(f"工具文件已变化，正在重载 {len(changed)} 个文件...")
+        with _reload_lock:
+            self._reload_files(changed)
+        log.success("--- 工具重载完成！ ---")
+
+    def _reload_files(self, changed):
+        # 只重载发生变化的文件。始终复用同一个 FastMCP 实例，
+        # 正在运行的 SSE 传输和静态工具的注册都不受影响
+        for path in sorted(changed):
+            base = os.path.basename(path)
+            name = os.path.splitext(base)[0]
+            if os.path.dirname(path) != self.full_dir or not base.endswith(".py") or name.startswith("_"):
+                continue  # 与 load_tools_from_dir 保持一致：只处理目录顶层的公开 .py 模块（rename 的另一端可能是 .tmp/.bak）
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                _unload_tool_module(path)
+                log.info(f"工具模块已删除，已注销其工具: {self.hot_reload_dir}/{name}.py")
+                continue
+            if _is_module_unchanged(path, st):
+                continue
+            _unload_tool_module(path)
+            try:
+                _load_tool_module(self.hot_reload_dir, path, st)
+                log.success(f"成功重载工具模块: {self.hot_reload_dir}/{name}.py")
+            except Exception as e:
+                log.error(f"重载 {self.hot_reload_dir}/{name}.py 失败: {e}")
 
 ### 服务器启动和运行
 
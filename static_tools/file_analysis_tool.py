@@ -1,47 +1,90 @@
 # mcp_server/default_tools/file_analysis_tool.py
-import pandas as pd
 import os
 import asyncio
-from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional
 from server import mcp  # Import from centralized app
 from logger import log as logger  # 从中央日志记录器导入
 
-from config import API_KEY, ENDPOINT
+from config import get as get_config
+from llm_clients import get_openai
 
-# 从你的项目配置中导入 API_KEY
-# try:
-#     from config import GOOGLE_API_KEY
-# except ImportError:
-#     logger.warning("config.py not found or GOOGLE_API_KEY not set. Attempting to use environment variable.")
-#     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "YOUR_FALLBACK_GOOGLE_API_KEY_IF_ENV_NOT_SET")
+# 进程内共享、只解析一次的配置
+cfg = get_config()
+
+# 已解析的 DataFrame 缓存：(绝对路径, mtime, nrows, usecols) -> DataFrame
+# 对同一文件的重复提问无需重新解析；文件被修改后 mtime 变化，自然失效
+_df_cache: Dict[tuple, Any] = {}
+_DF_CACHE_MAX_ENTRIES = 8
+# _read_csv 在 asyncio.to_thread 的工作线程中运行，缓存的读取和淘汰必须加锁
+_df_cache_lock = threading.Lock()
+
+def _read_csv(file_path: str, nrows: Optional[int], usecols: Optional[List[str]]):
+    """读取 CSV 文件，优先使用 pyarrow 的向量化解析器，并缓存解析结果。"""
+    import pandas as pd
+
+    key = (os.path.abspath(file_path), os.path.getmtime(file_path), nrows, tuple(usecols) if usecols else None)
+    with _df_cache_lock:
+        df = _df_cache.get(key)
+    if df is not None:
+        return df
+
+    df = None
+    # pyarrow 引擎不支持 nrows，只有读取整个文件时才使用
+    if nrows is None:
+        try:
+            df = pd.read_csv(file_path, engine="pyarrow", dtype_backend="pyarrow", usecols=usecols)
+        except ImportError:
+            logger.debug("未安装 pyarrow，回退到 pandas 默认的 CSV 解析器。")
+    if df is None:
+        df = pd.read_csv(file_path, nrows=nrows, usecols=usecols)
+
+    with _df_cache_lock:
+        if key not in _df_cache and len(_df_cache) >= _DF_CACHE_MAX_ENTRIES:
+            _df_cache.pop(next(iter(_df_cache)))
+        _df_cache[key] = df
+    return df
 
 @mcp.tool()
-async def analyze_csv_file(file_path: str, question: str) -> str:
+async def analyze_csv_file(
+    file_path: str,
+    question: str,
+    nrows: Optional[int] = None,
+    usecols: Optional[List[str]] = None
+) -> str:
     """
     【文件分析工具】此工具用于从指定的CSV文件中加载数据，并回答关于该数据的问题。
     它使用LangChain的Pandas DataFrame Agent来执行数据分析。
 
+    注意：安装了 pyarrow 且未指定 nrows 时，数据以 pyarrow 后端读取（列类型为 ArrowDtype，
+    例如 int64[pyarrow]、string[pyarrow]，日期列的类型推断也与 pandas 默认解析器不同）；
+    指定 nrows 或未安装 pyarrow 时使用 pandas 默认的 NumPy 类型。
+
     Args:
         file_path (str): 需要被分析的CSV文件的本地路径。
         question (str): 关于该CSV文件内容的自然语言问题。
+        nrows (Optional[int]): 可选，只读取文件的前 nrows 行，适用于超大文件。
+        usecols (Optional[List[str]]): 可选，只读取回答问题所需的列。
 
     Returns:
         str: 数据分析的结果，或错误信息。
     """
+    # pandas 和 LangChain 导入开销很大，延迟到工具真正被调用时再导入，
+    # 这样服务器启动和其它工具热重载时不必为它们付出导入成本
+    from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
+    # from langchain_google_genai import ChatGoogleGenerativeAI
+
     logger.info(f"--- [文件分析工具(Gemini) - 默认工具] 正在分析文件 '{file_path}'，问题: '{question}' ---")
 
     # 检查 GOOGLE_API_KEY 是否设置
-    if not API_KEY or API_KEY == "YOUR_FALLBACK_GOOGLE_API_KEY_IF_ENV_NOT_SET":
+    if not cfg.API_KEY or cfg.API_KEY == "YOUR_FALLBACK_GOOGLE_API_KEY_IF_ENV_NOT_SET":
         error_msg = "API_KEY 未设置或为默认值，无法调用模型进行文件分析。"
         logger.error(f"--- [文件分析工具(Gemini) - 默认工具 ERROR] {error_msg} ---")
         return f"错误: {error_msg}"
 
     try:
         # Reading CSV can be an I/O operation, run in a thread
-        df = await asyncio.to_thread(pd.read_csv, file_path)
+        df = await asyncio.to_thread(_read_csv, file_path, nrows, usecols)
     except FileNotFoundError:
         logger.error(f"--- [文件分析工具(Gemini) ERROR] 文件未找到: '{file_path}' ---")
         return f"错误: 文件未找到，路径: '{file_path}'。"
@@ -49,18 +92,13 @@ async def analyze_csv_file(file_path: str, question: str) -> str:
         logger.error(f"--- [文件分析工具(Gemini) ERROR] 读取CSV文件时出错: {e} ---")
         return f"错误: 读取CSV文件时出错: {e}"
 
-    llm = ChatOpenAI(
-        model="google/gemini-2.5-pro",  # 使用最新的Gemini 2.5 Pro 模型
-        temperature=0.1,
-        api_key=API_KEY,
-        base_url=ENDPOINT
-    )
-    # llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, google_api_key=GOOGLE_API_KEY)
+    llm = get_openai("google/gemini-2.5-pro", cfg.API_KEY, cfg.ENDPOINT, 0.1)  # 使用最新的Gemini 2.5 Pro 模型
+    # llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0, google_api_key=cfg.GOOGLE_API_KEY)
     
     # 创建Pandas DataFrame Agent
     pandas_agent_executor = create_pandas_dataframe_agent(
         llm=llm,
-        df=df,
+        df=df.copy(),  # LLM 生成的代码可能原地修改数据，避免污染缓存的 DataFrame
         verbose=False, # 设置为True可以在控制台查看LLM生成的Python代码
         agent_executor_kwargs={"handle_parsing_errors": True}
     )
@@ -1,34 +1,38 @@
 import os
+import sys
 import importlib.util
 import tempfile
 import traceback
 import re
-import datetime
-from typing import Dict, Any, Optional, List
+import time
+import operator
+from typing import Annotated, Dict, Any, Optional, List, Tuple
 
-from server import mcp # 保证引用的是 server.py 中的 mcp 实例
+from server import mcp, unregister_module_tools # 保证引用的是 server.py 中的 mcp 实例
 from logger import log as logger # 从中央日志记录器导入
 
 # LangChain 和 LangGraph 相关的导入
+# 较重的 langgraph / langchain_openai 等依赖在使用处延迟导入，避免模块加载（含热重载）时的导入开销
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langgraph.graph import StateGraph, END, START
 from pydantic import BaseModel, Field, ValidationError
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
 
-from config import API_KEY, ENDPOINT
+from config import get as get_config
+from llm_clients import get_openai
 
-# 从你的项目配置中导入 GOOGLE_API_KEY
-# try:
-#     from config import GOOGLE_API_KEY
-# except ImportError:
-#     logger.warning("config.py not found or GOOGLE_API_KEY not set. Attempting to use environment variable.")
-#     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "YOUR_FALLBACK_GOOGLE_API_KEY_IF_ENV_NOT_SET")
+# 预编译的正则：工具名清洗、从 LLM 响应中提取 Python 代码块
+_NAME_SANITIZE = re.compile(r'[^a-zA-Z0-9_]')
+_PY_BLOCK = re.compile(r"```python\s*\n(.*?)\n```", re.DOTALL)
+# 去掉首尾残缺或不规范的 Markdown 代码围栏（如缺少换行、只有开头或结尾的 ```）
+_FENCE = re.compile(r"^\s*```(?:python)?\s*|\s*```\s*$")
+
+# 进程内共享、只解析一次的配置
+cfg = get_config()
 
 # --- LangGraph Agent State Definition ---
 class SimpleMetaToolAgentState(BaseModel):
-    messages: List[HumanMessage] = Field(default_factory=list, description="Agent的对话历史和当前输入/输出。")
+    # 使用 operator.add 作为 reducer：节点只返回新增的消息，由 LangGraph 追加到历史中，
+    # 避免每一步都复制整个消息列表并重新校验整个模型
+    messages: Annotated[List[HumanMessage], operator.add] = Field(default_factory=list, description="Agent的对话历史和当前输入/输出。")
     generated_code: Optional[str] = Field(default=None, description="上一次生成的工具代码。")
     tool_name: Optional[str] = Field(default=None, description="本次要生成的工具名称。")
     retries: int = Field(default=0, description="代码生成和测试的重试次数。")
@@ -37,15 +41,15 @@ class SimpleMetaToolAgentState(BaseModel):
 
 # --- SimpleMetaToolAgent Class (Internal Logic) ---
 class SimpleMetaToolAgent:
+    model_name = "google/gemini-2.5-pro"
+
     # 构造函数不再接收 ctx
     def __init__(self):
-        self.model = ChatOpenAI(
-            model="google/gemini-2.5-pro", 
-            temperature=0.1,
-            api_key=API_KEY, 
-            base_url=ENDPOINT
-        )
-        # self.model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.1, google_api_key=GOOGLE_API_KEY)
+        # from langchain_google_genai import ChatGoogleGenerativeAI
+
+        # 与其它工具共享同一个 ChatOpenAI 客户端及其 HTTP 连接池
+        self.model = get_openai(self.model_name, cfg.API_KEY, cfg.ENDPOINT, 0.1)
+        # self.model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.1, google_api_key=cfg.GOOGLE_API_KEY)
         
         self.graph = self._build_graph()
         logger.info("SimpleMetaToolAgent 初始化完成。") # 仅打印到服务器终端
@@ -56,7 +60,7 @@ class SimpleMetaToolAgent:
         """
         if self.model is None:
             # 回退到时间戳命名
-            return f"generated_tool_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+            return f"generated_tool_{time.strftime('%Y%m%d%H%M%S')}"
 
         prompt = (
             "你是一位专业的Python工具命名专家。请根据以下工具需求，为该工具生成一个简洁、专业、易懂的英文函数名（仅小写字母、数字和下划线，必须以字母开头，不能有空格，不能有中文，不能有特殊字符，不能以test、tmp、demo等无意义词开头，不能超过30字符），直接输出函数名即可，不要加任何解释说明：\n"
@@ -68,21 +72,21 @@ class SimpleMetaToolAgent:
             tool_name = response.splitlines()[0]
             tool_name = tool_name.strip()
             # 规范化
-            tool_name = re.sub(r'[^a-zA-Z0-9_]', '', tool_name)
+            tool_name = _NAME_SANITIZE.sub('', tool_name)
             tool_name = tool_name.lower()
             if tool_name and tool_name[0].isalpha() and len(tool_name) <= 30:
                 return tool_name
         except Exception as e:
             logger.warning(f"LLM命名失败，回退到时间戳命名。错误: {e}")
-        return f"generated_tool_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+        return f"generated_tool_{time.strftime('%Y%m%d%H%M%S')}"
 
-    async def _tool_writer_node(self, state: SimpleMetaToolAgentState) -> SimpleMetaToolAgentState:
+    async def _tool_writer_node(self, state: SimpleMetaToolAgentState) -> Dict[str, Any]:
         # 不再使用 self.ctx，直接在 state.messages 中记录
         logger.info(f"节点: 1. 编写工具代码 (重试次数: {state.retries})")
         
         if self.model is None:
-            # 直接返回包含错误消息的状态
-            return state.copy(update={"messages": state.messages + [HumanMessage(content="错误：SimpleMetaToolAgent 未能初始化，因为 GOOGLE_API_KEY 未设置。")]})
+            # 直接返回错误消息
+            return {"messages": [HumanMessage(content="错误：SimpleMetaToolAgent 未能初始化，因为 GOOGLE_API_KEY 未设置。")]}
 
         user_request = state.messages[0].content
         current_messages = state.messages
@@ -117,6 +121,8 @@ class SimpleMetaToolAgent:
             error_feedback = current_messages[-1].content 
             user_prompt_messages.append(HumanMessage(content=f"\n之前尝试的代码未能通过测试，请修正以下问题并重新生成：\n```\n{error_feedback}\n```\n\n请严格按照要求重新生成完整的Python代码。"))
 
+        from langchain_core.prompts import ChatPromptTemplate
+
         full_prompt = ChatPromptTemplate.from_messages([
             ("system", system_prompt_content.format(tool_name=tool_name)),
             *user_prompt_messages
@@ -125,23 +131,22 @@ class SimpleMetaToolAgent:
         chain = full_prompt | self.model
         raw_response = (await chain.ainvoke({})).content
         
-        code_match = re.search(r"```python\s*\n(.*?)\n```", raw_response, re.DOTALL)
+        code_match = _PY_BLOCK.search(raw_response)
         if code_match:
             generated_code = code_match.group(1).strip()
             logger.info("    -> 已成功从LLM响应中提取Python代码块。")
         else:
             logger.warning("    -> 未在LLM响应中找到 ```python ... ``` 代码块，将尝试直接使用全部内容。")
-            generated_code = raw_response.strip()
+            generated_code = _FENCE.sub("", raw_response).strip()
 
-        new_state = state.copy(update={
-            "messages": state.messages + [HumanMessage(content=generated_code)], 
-            "generated_code": generated_code, 
+        return {
+            "messages": [HumanMessage(content=generated_code)],
+            "generated_code": generated_code,
             "tool_name": tool_name,
             "retries": state.retries + 1
-        })
-        return new_state
+        }
     
-    def _test_and_save_node(self, state: SimpleMetaToolAgentState) -> SimpleMetaToolAgentState:
+    def _test_and_save_node(self, state: SimpleMetaToolAgentState) -> Dict[str, Any]:
         logger.info(f"节点: 2. 测试并保存代码 (重试次数: {state.retries-1})")
         code_to_test = state.generated_code
         tool_name = state.tool_name
@@ -149,16 +154,26 @@ class SimpleMetaToolAgent:
         if not code_to_test or not tool_name:
             error_message = "内部错误：没有可测试的代码或工具名称缺失。"
             logger.error(error_message)
-            return state.copy(update={"messages": state.messages + [HumanMessage(content=error_message)]})
+            return {"messages": [HumanMessage(content=error_message)]}
+
+        # 先在内存中编译：语法错误直接反馈给 LLM，无需写临时文件和走导入流程
+        try:
+            compile(code_to_test, f"<generated {tool_name}>", "exec")
+        except SyntaxError as e:
+            error_message = f"代码未能通过内部测试。语法错误: {e}"
+            logger.error(error_message)
+            return {"messages": [HumanMessage(content=error_message)], "generated_code": None}
 
         temp_dir = os.path.join(tempfile.gettempdir(), "mcp_generated_tools_test")
         os.makedirs(temp_dir, exist_ok=True)
-        tmp_path = os.path.join(temp_dir, f"temp_{tool_name}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}.py")
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", suffix=".py", prefix=f"temp_{tool_name}_", dir=temp_dir, delete=False
+        ) as tmp_file:
+            tmp_file.write(code_to_test)
+            tmp_path = tmp_file.name
 
+        module = None
         try:
-            with open(tmp_path, 'w', encoding='utf-8') as tmp_file:
-                tmp_file.write(code_to_test)
-
             spec = importlib.util.spec_from_file_location("temp_tool_test_module", tmp_path)
             module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(module)
@@ -176,14 +191,20 @@ class SimpleMetaToolAgent:
             success_message = f"新工具 '{tool_name}.py' 已成功生成并保存到 '{output_dir}'。服务器已自动重载该工具。"
             logger.info(success_message)
             # 将成功消息添加到状态中，以便最终返回
-            return state.copy(update={"messages": state.messages + [HumanMessage(content=success_message)], "generated_code": code_to_test})
+            return {"messages": [HumanMessage(content=success_message)], "generated_code": code_to_test}
 
         except Exception as e:
             error_message = f"代码未能通过内部测试。错误: {e}. 详细堆栈: {traceback.format_exc()}"
             logger.error(error_message)
             # 将错误消息添加到状态中，以便最终返回
-            return state.copy(update={"messages": state.messages + [HumanMessage(content=error_message)], "generated_code": None})
+            return {"messages": [HumanMessage(content=error_message)], "generated_code": None}
         finally:
+            # 测试导入时 @mcp.tool() 已把生成的工具注册到共享的 mcp 上，必须注销，
+            # 否则它会占住工具名，tools/ 中保存的正式文件既无法注册也无法热重载
+            unregister_module_tools("temp_tool_test_module")
+            # 释放测试模块的引用，避免长时间运行后 sys.modules 中残留测试模块
+            sys.modules.pop("temp_tool_test_module", None)
+            del module
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
 
@@ -199,6 +220,8 @@ class SimpleMetaToolAgent:
         return "rewrite" # 否则，继续重写
 
     def _build_graph(self):
+        from langgraph.graph import StateGraph, END
+
         workflow = StateGraph(SimpleMetaToolAgentState)
         
         workflow.add_node("write_tool", self._tool_writer_node)
@@ -256,6 +279,17 @@ class SimpleMetaToolAgent:
                 messages=[HumanMessage(content=f"错误：AI工具构建大师核心执行失败: {e}. 详情请看服务器日志。")]
             )
 
+# SimpleMetaToolAgent 本身无状态（状态通过 LangGraph 传递），
+# 按 (API_KEY, ENDPOINT, 模型名) 缓存实例，复用 LLM 客户端和已编译的图
+_agent_cache: Dict[Tuple[str, str, str], SimpleMetaToolAgent] = {}
+
+def _get_agent() -> SimpleMetaToolAgent:
+    key = (cfg.API_KEY, cfg.ENDPOINT, SimpleMetaToolAgent.model_name)
+    agent = _agent_cache.get(key)
+    if agent is None:
+        agent = _agent_cache[key] = SimpleMetaToolAgent()
+    return agent
+
 # --- MCP Tool Function ---
 @mcp.tool()
 # create_simple_mcp_tool 不再接收 ctx 参数
@@ -277,8 +311,7 @@ async def create_simple_mcp_tool(tool_description_request: str) -> str:
     """
     logger.info(f"调用 'create_simple_mcp_tool'。请求: '{tool_description_request[:100]}...'")
     
-    # 每次调用工具时都创建 SimpleMetaToolAgent 的新实例
-    agent = SimpleMetaToolAgent()
+    agent = _get_agent()
         
     if agent.model is None:
         return "错误：AI工具构建大师未能初始化，因为 GOOGLE_API_KEY 未设置。请检查您的配置。"
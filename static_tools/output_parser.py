@@ -5,35 +5,27 @@ import asyncio
 from server import mcp  # 确保引用的是 server.py 中的实例
 from logger import log as logger  # 从中央日志记录器导入
 
-@mcp.tool()
-async def parse_and_format_output(answer_content: str) -> str:
-    """
-    【输出格式化工具】接收最终的、可能包含Markdown和Mermaid代码的答复字符串，
-    并将其转换为一个功能完整的、自包含的HTML页面。
-    
-    Args:
-        answer_content (str): 包含Markdown和Mermaid代码的原始文本。
-    
-    Returns:
-        str: 一个包含渲染后的文本和Mermaid图（如果存在）的HTML字符串。
-    """
-    logger.info("--- [输出工具] 正在将最终答案转换为HTML... ---")
-    
-    mermaid_code = ""
-    text_content = answer_content
+# 预编译的 Mermaid 代码块匹配正则
+_MERMAID_BLOCK = re.compile(r"```mermaid\s*\n(.*?)\n```", re.DOTALL)
 
-    # 使用正则表达式提取Mermaid代码块，并将其从原文中移除
-    mermaid_match = re.search(r"```mermaid\s*\n(.*?)\n```", text_content, re.DOTALL)
-    if mermaid_match:
-        mermaid_code = mermaid_match.group(1).strip()
-        text_content = text_content.replace(mermaid_match.group(0), "").strip()
-    
-    # 将剩余的Markdown文本转换为HTML
-    md = MarkdownIt()
-    text_html = await asyncio.to_thread(md.render, text_content)
-    
-    # 构建最终的HTML页面
-    html_template = f"""
+# 全局共享的 Markdown 解析器，避免每次调用都重新构建规则表
+_MD = MarkdownIt()
+
+# HTML 页面模板在模块加载时预先拼好，调用时只需 str.format 替换可变字段
+# （CSS/JS 中的花括号已转义为 {{ }}）
+_DIAGRAM_SECTION = """
+            <div class="content-section">
+                <h2>生成图表</h2>
+                <div class="mermaid">
+                    {mermaid_code}
+                </div>
+                <div style="text-align:center;">
+                    <button id="downloadBtn">导出为 PNG</button>
+                </div>
+            </div>
+            """
+
+_HTML_PAGE = """
     <!DOCTYPE html>
     <html lang="zh-CN">
     <head>
@@ -57,17 +49,7 @@ async def parse_and_format_output(answer_content: str) -> str:
                 <h2>文字答复</h2>
                 {text_html}
             </div>
-            {"".join([f'''
-            <div class="content-section">
-                <h2>生成图表</h2>
-                <div class="mermaid">
-                    {mermaid_code}
-                </div>
-                <div style="text-align:center;">
-                    <button id="downloadBtn">导出为 PNG</button>
-                </div>
-            </div>
-            ''' if mermaid_code else ""])}
+            {diagram_section}
         </div>
 
         <script>
@@ -125,4 +107,36 @@ async def parse_and_format_output(answer_content: str) -> str:
     </body>
     </html>
     """
-    return html_template
+
+_HTML_WITH_DIAGRAM = _HTML_PAGE.replace("{diagram_section}", _DIAGRAM_SECTION)
+_HTML_WITHOUT_DIAGRAM = _HTML_PAGE.replace("{diagram_section}", "")
+
+@mcp.tool()
+async def parse_and_format_output(answer_content: str) -> str:
+    """
+    【输出格式化工具】接收最终的、可能包含Markdown和Mermaid代码的答复字符串，
+    并将其转换为一个功能完整的、自包含的HTML页面。
+    
+    Args:
+        answer_content (str): 包含Markdown和Mermaid代码的原始文本。
+    
+    Returns:
+        str: 一个包含渲染后的文本和Mermaid图（如果存在）的HTML字符串。
+    """
+    logger.info("--- [输出工具] 正在将最终答案转换为HTML... ---")
+    
+    mermaid_code = ""
+    text_content = answer_content
+
+    # 使用正则表达式提取Mermaid代码块，并将其从原文中移除
+    mermaid_match = _MERMAID_BLOCK.search(text_content)
+    if mermaid_match:
+        mermaid_code = mermaid_match.group(1).strip()
+        text_content = text_content.replace(mermaid_match.group(0), "").strip()
+    
+    # 将剩余的Markdown文本转换为HTML
+    text_html = await asyncio.to_thread(_MD.render, text_content)
+    
+    # 构建最终的HTML页面
+    template = _HTML_WITH_DIAGRAM if mermaid_code else _HTML_WITHOUT_DIAGRAM
+    return template.format(text_html=text_html, mermaid_code=mermaid_code)
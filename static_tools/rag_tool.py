@@ -1,20 +1,86 @@
 # mcp_server/default_tools/rag_tool.py
-import os
+import atexit
+import copy
+import hashlib
+import heapq
 import httpx
 import json
 import asyncio
-from langchain_cohere import CohereRerank
-from langchain_core.documents import Document
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 from server import mcp
 from logger import log as logger
 
-# 从 config.py 导入 COHERE_API_KEY
+from config import get as get_config
+
+# 有 orjson 时用它序列化请求、解析较大的检索结果，否则回退到标准库；orjson.JSONDecodeError 是 json.JSONDecodeError 的子类
 try:
-    from config import COHERE_API_KEY
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
 except ImportError:
-    logger.warning("config.py not found or COHERE_API_KEY not set. Attempting to use environment variable.")
-    COHERE_API_KEY = os.getenv("COHERE_API_KEY", "YOUR_FALLBACK_COHERE_API_KEY_IF_ENV_NOT_SET")
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# 进程内共享、只解析一次的配置
+COHERE_API_KEY = get_config().COHERE_API_KEY
+# 密钥是否可用只在导入时判断一次
+_COHERE_KEY_OK = bool(COHERE_API_KEY) and COHERE_API_KEY != "YOUR_FALLBACK_COHERE_API_KEY_IF_ENV_NOT_SET"
+
+OS_RAG_URL = "https://osrag.635262140.xyz/agent"
+
+# 直接调用 Cohere Rerank REST 接口，复用下方的共享连接池，而不是在线程池里跑同步 SDK
+COHERE_RERANK_URL = "https://api.cohere.com/v1/rerank"
+COHERE_RERANK_MODEL = "rerank-multilingual-v3.0"
+RERANK_TOP_N = 5
+_COHERE_HEADERS = {**_JSON_HEADERS, "Authorization": f"Bearer {COHERE_API_KEY}"}
+
+# 送入 Cohere 重排的最大候选数，先按 RAG 服务返回的分数粗筛
+RERANK_CANDIDATES = 20
+
+# 检索结果的进程内 LRU 缓存，键为规范化后的查询
+_QUERY_CACHE_SIZE = 512
+_query_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+# 重排结果缓存，键为 (模型, top_n, 查询, 候选文本) 的 blake2b 摘要；命中时跳过 Cohere 调用。
+# 只缓存 Cohere 返回的 (下标, 相关性分数)，元数据每次都从本次传入的文档重新组装
+_rerank_cache: "OrderedDict[bytes, List[Tuple[int, Optional[float]]]]" = OrderedDict()
+
+class DocMeta(NamedTuple):
+    """重排过程中的文档元数据，只在最终返回时才转换成字典。"""
+    file_id: Optional[str]
+    filename: Optional[str]
+    score: Optional[float]
+    attributes: Optional[Dict[str, Any]]
+
+_ERR_PREFIX = "--- [OS知识检索工具 ERROR] "
+_ERR_SUFFIX = " ---"
+
+def _normalize_query(query: str) -> str:
+    return query.strip().lower()
+
+def _create_http_client() -> httpx.AsyncClient:
+    """创建模块级共享的连接池客户端；安装了 h2 时启用 HTTP/2 多路复用。"""
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    try:
+        return httpx.AsyncClient(limits=limits, timeout=20, http2=True)
+    except ImportError:
+        logger.debug("未安装 h2，RAG 客户端回退到 HTTP/1.1。")
+        return httpx.AsyncClient(limits=limits, timeout=20)
+
+# 所有 RAG 查询复用同一个客户端，避免每次查询都重新进行 TCP + TLS 握手
+_HTTP_CLIENT = _create_http_client()
+
+@atexit.register
+def _close_http_client():
+    # 进程退出时事件循环已结束，在新的循环中关闭连接池；失败也不影响退出
+    try:
+        asyncio.run(_HTTP_CLIENT.aclose())
+    except Exception:
+        pass
 
 @mcp.tool()
 async def retrieve_os_knowledge(query: str) -> List[Dict[str, Any]]:
@@ -28,40 +94,59 @@ async def retrieve_os_knowledge(query: str) -> List[Dict[str, Any]]:
         List[Dict[str, Any]]: 一个包含原始文档信息的字典列表，或在出错时返回包含错误信息的列表。
     """
     logger.info(f"--- [OS知识检索工具] 开始处理查询: '{query}' ---")
+
+    key = _normalize_query(query)
+    cached = _query_cache.get(key)
+    if cached is not None:
+        _query_cache.move_to_end(key)
+        logger.success(f"    -> 命中缓存，返回 {len(cached)} 篇原始文档。")
+        # 深拷贝：调用方修改返回的文档不会污染缓存
+        return copy.deepcopy(cached)
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://osrag.635262140.xyz/agent",
-                json={"query": query},
-                timeout=20
-            )
-            response.raise_for_status()
-            result = response.json()
+        response = await _HTTP_CLIENT.post(OS_RAG_URL, content=_json_dumps({"query": query}), headers=_JSON_HEADERS)
+        response.raise_for_status()
+        result = _json_loads(response.content)
         
         initial_docs_data = result.get("data", [])
         logger.success(f"    -> 成功检索到 {len(initial_docs_data)} 篇原始文档。")
 
-        # 将原始数据直接返回，让下一个工具处理
-        return initial_docs_data
+        # 只缓存成功的结果，出错的查询下次仍会重新请求
+        _query_cache[key] = initial_docs_data
+        if len(_query_cache) > _QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+
+        # 返回副本，缓存中保留的原始数据不会被调用方修改
+        return copy.deepcopy(initial_docs_data)
 
     except httpx.TimeoutException:
         error_msg = "连接 OS RAG 服务超时"
-        logger.error(f"--- [OS知识检索工具 ERROR] {error_msg} ---")
-        return [{"error": error_msg}]
     except httpx.RequestError as e:
         error_msg = f"调用 OS RAG 服务失败: {e}"
-        logger.error(f"--- [OS知识检索工具 ERROR] {error_msg} ---")
-        return [{"error": error_msg}]
     except json.JSONDecodeError as e:
         error_msg = f"解析 OS RAG 服务响应失败: {e}. 响应内容: {response.text}"
-        logger.error(f"--- [OS知识检索工具 ERROR] {error_msg} ---")
-        return [{"error": error_msg}]
     except Exception as e:
         error_msg = f"OS RAG 服务响应处理异常: {e}"
-        logger.error(f"--- [OS知识检索工具 ERROR] {error_msg} ---")
+        logger.exception("{}{}{}", _ERR_PREFIX, error_msg, _ERR_SUFFIX)
         return [{"error": error_msg}]
 
+    # 固定格式串交给 loguru 延迟格式化，级别被关闭时不再拼接字符串
+    logger.error("{}{}{}", _ERR_PREFIX, error_msg, _ERR_SUFFIX)
+    return [{"error": error_msg}]
+
+@mcp.tool()
+async def retrieve_many(queries: List[str]) -> List[List[Dict[str, Any]]]:
+    """
+    【OS知识批量检索工具】并发检索多个问题，总耗时取决于最慢的一次查询而非所有查询之和。
+    
+    Args:
+        queries (List[str]): 需要检索的问题列表。
+        
+    Returns:
+        List[List[Dict[str, Any]]]: 与输入顺序一一对应的检索结果列表。
+    """
+    return list(await asyncio.gather(*(retrieve_os_knowledge(q) for q in queries)))
+
 @mcp.tool()
 async def rerank_documents_with_cohere(query: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -76,7 +161,7 @@ async def rerank_documents_with_cohere(query: str, documents: List[Dict[str, Any
     """
     logger.info(f"--- [Cohere重排工具] 开始为查询 '{query}' 重排 {len(documents)} 篇文档 ---")
 
-    if not COHERE_API_KEY or COHERE_API_KEY == "YOUR_FALLBACK_COHERE_API_KEY_IF_ENV_NOT_SET":
+    if not _COHERE_KEY_OK:
         error_msg = "COHERE_API_KEY 未设置或为默认值，无法使用 Cohere Rerank。"
         logger.error(f"--- [Cohere重排工具 ERROR] {error_msg} ---")
         return [{"error": error_msg}]
@@ -85,51 +170,88 @@ async def rerank_documents_with_cohere(query: str, documents: List[Dict[str, Any
         logger.warning("输入的文档列表为空，无需重排。")
         return []
 
-    # 将字典列表转换为 LangChain 的 Document 对象
+    # 将字典列表转换为 (page_content, metadata) 二元组
+    dict_items = [d for d in documents if isinstance(d, dict)]
+    if len(dict_items) != len(documents):
+        logger.warning(f"检测到 {len(documents) - len(dict_items)} 篇非预期格式的文档，已跳过。")
+
     documents_for_rerank = []
-    for doc_item in documents:
-        if isinstance(doc_item, dict):
-            content_list = doc_item.get("content", [])
-            if isinstance(content_list, list):
-                page_content = "\n".join(
-                    c.get("text", "") for c in content_list if isinstance(c, dict)
-                )
-            else:
-                page_content = ""
-            metadata = {
-                "file_id": doc_item.get("file_id"),
-                "filename": doc_item.get("filename"),
-                "score": doc_item.get("score"),
-                "attributes": doc_item.get("attributes"),
-            }
-            documents_for_rerank.append(Document(page_content=page_content, metadata=metadata))
+    for doc_item in dict_items:
+        content_list = doc_item.get("content", [])
+        if isinstance(content_list, list):
+            # 跳过空片段，避免多余的换行进入 Cohere 请求
+            texts = [c["text"] for c in content_list if isinstance(c, dict) and c.get("text")]
+            page_content = "\n".join(texts)
         else:
-            logger.warning(f"检测到非预期的文档格式: {type(doc_item)}")
+            page_content = ""
+        metadata = DocMeta(
+            doc_item.get("file_id"),
+            doc_item.get("filename"),
+            doc_item.get("score"),
+            doc_item.get("attributes"),
+        )
+        documents_for_rerank.append((page_content, metadata))
 
     if not documents_for_rerank:
         logger.warning("转换后没有可用于重排的文档。")
         return []
 
+    if len(documents_for_rerank) > RERANK_CANDIDATES:
+        documents_for_rerank = heapq.nlargest(
+            RERANK_CANDIDATES,
+            documents_for_rerank,
+            key=lambda d: d[1].score or 0.0,
+        )
+        logger.info(f"    -> 按初始分数预筛选出 {len(documents_for_rerank)} 篇候选文档。")
+
+    cache_key = hashlib.blake2b(
+        _json_dumps([
+            COHERE_RERANK_MODEL,
+            RERANK_TOP_N,
+            query,
+            [page_content for page_content, _ in documents_for_rerank],
+        ]),
+        digest_size=16,
+    ).digest()
+
+    def _build_results(ranking: List[Tuple[int, Optional[float]]]) -> List[Dict[str, Any]]:
+        # 按 Cohere 返回的下标映射回本次的原始文档，并附上相关性分数
+        return [
+            {
+                "page_content": documents_for_rerank[index][0],
+                "metadata": {**documents_for_rerank[index][1]._asdict(), "relevance_score": relevance_score},
+            }
+            for index, relevance_score in ranking
+        ]
+
+    cached = _rerank_cache.get(cache_key)
+    if cached is not None:
+        _rerank_cache.move_to_end(cache_key)
+        logger.success(f"    -> 命中重排缓存，返回 {len(cached)} 篇高相关性文档。")
+        return _build_results(cached)
+
     logger.info(f"    -> 使用Cohere Rerank进行重排序和筛选...")
     try:
-        reranker = CohereRerank(cohere_api_key=COHERE_API_KEY, model="rerank-multilingual-v3.0", top_n=5)
-        # reranker.compress_documents 是一个同步方法，需要在线程中运行以避免阻塞
-        reranked_docs = await asyncio.to_thread(
-            reranker.compress_documents,
-            documents=documents_for_rerank, 
-            query=query
+        response = await _HTTP_CLIENT.post(
+            COHERE_RERANK_URL,
+            content=_json_dumps({
+                "model": COHERE_RERANK_MODEL,
+                "query": query,
+                "documents": [page_content for page_content, _ in documents_for_rerank],
+                "top_n": RERANK_TOP_N,
+            }),
+            headers=_COHERE_HEADERS,
         )
-        logger.success(f"    -> 重排序后剩下 {len(reranked_docs)} 篇高相关性文档。")
-
-        # 将重排后的 Document 对象转换回字典列表
-        final_results = []
-        for doc in reranked_docs:
-            final_results.append({
-                "page_content": doc.page_content,
-                "metadata": doc.metadata
-            })
+        response.raise_for_status()
+        reranked = _json_loads(response.content).get("results", [])
+        logger.success(f"    -> 重排序后剩下 {len(reranked)} 篇高相关性文档。")
+
+        ranking = [(item["index"], item.get("relevance_score")) for item in reranked]
+        _rerank_cache[cache_key] = ranking
+        if len(_rerank_cache) > _QUERY_CACHE_SIZE:
+            _rerank_cache.popitem(last=False)
         
-        return final_results
+        return _build_results(ranking)
 
     except Exception as e:
         error_msg = f"使用 Cohere Rerank 失败: {e}"
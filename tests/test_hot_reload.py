@@ -0,0 +1,77 @@
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+pytest.importorskip("watchdog")
+pytest.importorskip("loguru")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TOOL_SOURCE = '''from server import mcp
+
+@mcp.tool()
+def adder(a: int, b: int) -> int:
+    return {expr}
+'''
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """执行 server.py 中启动服务器之前的部分：不加载工具目录，也不启动 watchdog 和 mcp.run。"""
+    # logger.py 会在当前目录下创建 logs/，放到临时目录中
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("logs"))
+    sys.path.insert(0, ROOT)
+    server_path = os.path.join(ROOT, "server.py")
+    with open(server_path, encoding="utf-8") as f:
+        source = f.read().split("### 服务器启动和运行")[0]
+    mod = types.ModuleType("server")
+    mod.__file__ = server_path
+    sys.modules["server"] = mod
+    try:
+        exec(compile(source, server_path, "exec"), mod.__dict__)
+        yield mod
+    finally:
+        sys.modules.pop("server", None)
+        sys.path.remove(ROOT)
+        os.chdir(cwd)
+
+
+def _tool_fn(server, name):
+    return server.mcp._tool_manager._tools[name].fn
+
+
+def test_generated_tool_can_be_edited_and_reloaded(server, tmp_path):
+    code = TOOL_SOURCE.format(expr="a + b")
+
+    # 1. 元工具的测试导入：以临时模块名执行生成的代码，结束后注销其注册的工具
+    test_file = tmp_path / "temp_adder.py"
+    test_file.write_text(code, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location("temp_tool_test_module", test_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert _tool_fn(server, "adder")(1, 2) == 3
+    assert server.unregister_module_tools("temp_tool_test_module") == ["adder"]
+    sys.modules.pop("temp_tool_test_module", None)
+
+    # 2. 保存到热重载目录后由服务器加载，工具归属于正式模块
+    hot_dir = tmp_path / "hot"
+    hot_dir.mkdir()
+    tool_path = hot_dir / "adder.py"
+    tool_path.write_text(code, encoding="utf-8")
+    mod = server._load_tool_module(str(hot_dir), str(tool_path))
+    try:
+        assert mod._mcp_tools == ["adder"]
+        assert _tool_fn(server, "adder")(1, 2) == 3
+
+        # 3. 修改文件后热重载，新代码立即生效
+        tool_path.write_text(TOOL_SOURCE.format(expr="a + b + 100"), encoding="utf-8")
+        handler = server.ToolReloaderHandler(server.mcp, str(hot_dir))
+        handler._reload_files({str(tool_path)})
+        assert _tool_fn(server, "adder")(1, 2) == 103
+    finally:
+        server._unload_tool_module(str(tool_path))
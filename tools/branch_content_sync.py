@@ -1,11 +1,13 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from server import mcp
 import asyncio
+import fnmatch
+import posixpath
 import subprocess
 from logger import log as logger
 
-async def _run_git_command(command: list, cwd: str):
-    """Asynchronously runs a git command."""
+async def _run_git_command(command: list, cwd: str) -> bytes:
+    """Asynchronously runs a git command and returns its raw stdout; callers decode only what they parse."""
     logger.debug(f"Running command: {' '.join(command)} in {cwd}")
     process = await asyncio.create_subprocess_exec(
         *command,
@@ -19,24 +21,34 @@ async def _run_git_command(command: list, cwd: str):
         logger.error(f"Stderr: {stderr.decode().strip()}")
         raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
     logger.debug(f"Command successful: {' '.join(command)}")
-    return stdout.decode().strip()
+    return stdout
+
+def _pathspec_matches(pathspec: str, name: str) -> bool:
+    """Approximates git's default pathspec matching: exact path, directory prefix, or wildcard pattern."""
+    spec = posixpath.normpath(pathspec.replace('\\', '/'))
+    if spec == '.':
+        return True
+    return name == spec or name.startswith(spec.rstrip('/') + '/') or fnmatch.fnmatchcase(name, spec)
 
 @mcp.tool()
 async def branch_content_sync(
     git_repo_path: str,
     source_branch: str,
-    target_branch: str
+    target_branch: str,
+    files: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     """
     Synchronizes content from a source branch to a target branch in a Git repository.
 
-    This tool checks out the target branch, attempts to cherry-pick commits from the source branch that modify the same files,
-    and handles potential conflicts.
+    This tool checks out the target branch and cherry-picks, in a single `git cherry-pick` invocation, every commit of
+    the source branch since the merge base that is not already applied to the target. If `files` is given, only commits from the source branch that modify
+    those files are cherry-picked. Conflicts abort the cherry-pick.
 
     Args:
         git_repo_path: The absolute path to the Git repository.
         source_branch: The name of the branch to sync content from.
         target_branch: The name of the branch to sync content to.
+        files: Optional list of pathspecs (files, directories or glob patterns) to restrict the sync to.
 
     Returns:
         A dictionary containing the result of the synchronization process, including:
@@ -51,61 +63,100 @@ async def branch_content_sync(
         await _run_git_command(['git', 'checkout', target_branch], git_repo_path)
         logger.success(f"Successfully checked out branch '{target_branch}'.")
 
-        # Find common files modified in both branches
-        logger.info(f"Finding modified files between '{source_branch}' and '{target_branch}'...")
-        diff_output = await _run_git_command(['git', 'diff', '--name-only', source_branch, target_branch], git_repo_path)
-        modified_files = diff_output.strip().split('\n') if diff_output else []
+        if not files:
+            # Commits on source_branch since the merge base whose patches are not yet in target_branch
+            revs_output = await _run_git_command(
+                ['git', 'rev-list', '--reverse', '--right-only', '--cherry-pick', '--no-merges', f'{target_branch}...{source_branch}'],
+                git_repo_path
+            )
+            commits = [line.decode() for line in revs_output.splitlines() if line]
+
+            if not commits:
+                message = f'{target_branch} already contains all commits from {source_branch}.'
+                logger.info(message)
+                return {
+                    'status': 'success',
+                    'message': message,
+                    'details': ''
+                }
+            logger.info(f"Cherry-picking {len(commits)} commits from '{source_branch}' in one batch...")
+
+            try:
+                cherry_pick_output = await _run_git_command(['git', 'cherry-pick', *commits], git_repo_path)
+            except subprocess.CalledProcessError as e:
+                conflict_msg = f"Conflict cherry-picking commits from {source_branch}: {e.stderr.decode().strip()}"
+                logger.error(conflict_msg)
+                logger.warning("Aborting cherry-pick due to conflict.")
+                await _run_git_command(['git', 'cherry-pick', '--abort'], git_repo_path)
+                return {
+                    'status': 'failure',
+                    'message': f'Conflicts encountered while cherry-picking {source_branch} onto {target_branch}. Aborted cherry-pick.',
+                    'details': [conflict_msg]
+                }
 
-        if not modified_files or modified_files == ['']:
-            message = f'No common files modified between {source_branch} and {target_branch}.'
-            logger.info(message)
+            final_success_message = f'Successfully synchronized content from {source_branch} to {target_branch}.'
+            logger.success(final_success_message)
             return {
                 'status': 'success',
-                'message': message,
-                'details': ''
+                'message': final_success_message,
+                'details': [f"Cherry-picked {len(commits)} commits: {cherry_pick_output.decode('utf-8', 'replace').strip()}"]
             }
-        logger.info(f"Found {len(modified_files)} modified files to process: {modified_files}")
 
-        # Cherry-pick commits from source_branch to target_branch for each modified file
+        modified_files = files
+        logger.info(f"Restricting sync to {len(modified_files)} files: {modified_files}")
+
+        # One NUL-delimited git log over all files: records are "<hash>\n<file>\0<file>\0..." separated by an empty field
+        log_output = await _run_git_command(
+            ['git', 'log', '--reverse', '--right-only', '--cherry-pick', '--no-merges', '--pretty=format:%H', '-z', '--name-only',
+             f'{target_branch}...{source_branch}', '--', *modified_files],
+            git_repo_path
+        )
+        commits = []
+        # Keyed by the paths git prints, so directory and glob pathspecs report the files they actually matched
+        commits_by_file = {}
+        for record in log_output.decode('utf-8', 'replace').split('\0\0'):
+            commit, _, names = record.strip('\0').partition('\n')
+            if not commit:
+                continue
+            commits.append(commit)
+            for name in names.split('\0'):
+                if name:
+                    commits_by_file.setdefault(name, []).append(commit)
+
         cherry_pick_results = []
-        for file in modified_files:
-            logger.info(f"Processing file: {file}")
-            # Find commits in source_branch that modify the file
-            log_output = await _run_git_command(['git', 'log', '--pretty=format:%H', source_branch, '--', file], git_repo_path)
-            commits = log_output.strip().split('\n') if log_output else []
-
-            if not commits or commits == ['']:
-                no_commit_msg = f"No commits found in {source_branch} modifying {file}"
+        for file, file_commits in commits_by_file.items():
+            logger.info(f"Found {len(file_commits)} commits for '{file}': {file_commits}")
+        for pathspec in modified_files:
+            if not any(_pathspec_matches(pathspec, name) for name in commits_by_file):
+                no_commit_msg = f"No commits found in {source_branch} modifying {pathspec}"
                 logger.info(no_commit_msg)
                 cherry_pick_results.append(no_commit_msg)
-                continue
-            
-            logger.info(f"Found {len(commits)} commits for '{file}': {commits}")
-
-            for commit in reversed(commits): # Cherry-pick from oldest to newest
-                logger.info(f"Attempting to cherry-pick commit '{commit}' for file '{file}'...")
-                try:
-                    cherry_pick_output = await _run_git_command(['git', 'cherry-pick', commit], git_repo_path)
-                    success_msg = f"Successfully cherry-picked commit {commit} for file {file}: {cherry_pick_output}"
-                    logger.success(success_msg)
-                    cherry_pick_results.append(success_msg)
-                except subprocess.CalledProcessError as e:
-                    # Handle conflicts
-                    conflict_msg = f"Conflict cherry-picking commit {commit} for file {file}: {e.stderr.decode().strip()}"
-                    logger.error(conflict_msg)
-                    cherry_pick_results.append(conflict_msg)
-                    
-                    logger.warning(f"Aborting cherry-pick for commit '{commit}' due to conflict.")
-                    await _run_git_command(['git', 'cherry-pick', '--abort'], git_repo_path)
-                    
-                    final_message = f'Conflicts encountered while cherry-picking commits for file {file}. Aborted cherry-pick.'
-                    logger.error(final_message)
-                    return {
-                        'status': 'failure',
-                        'message': final_message,
-                        'details': cherry_pick_results
-                    }
-        
+
+        if commits:
+            # Cherry-pick from oldest to newest, each commit once even if it touches several files
+            logger.info(f"Cherry-picking {len(commits)} commits for {len(modified_files)} files in one batch...")
+            try:
+                cherry_pick_output = await _run_git_command(['git', 'cherry-pick', *commits], git_repo_path)
+                success_msg = f"Successfully cherry-picked {len(commits)} commits: {cherry_pick_output.decode('utf-8', 'replace').strip()}"
+                logger.success(success_msg)
+                cherry_pick_results.append(success_msg)
+            except subprocess.CalledProcessError as e:
+                # Handle conflicts
+                conflict_msg = f"Conflict cherry-picking commits for files {modified_files}: {e.stderr.decode().strip()}"
+                logger.error(conflict_msg)
+                cherry_pick_results.append(conflict_msg)
+
+                logger.warning("Aborting cherry-pick due to conflict.")
+                await _run_git_command(['git', 'cherry-pick', '--abort'], git_repo_path)
+
+                final_message = f'Conflicts encountered while cherry-picking commits for files {modified_files}. Aborted cherry-pick.'
+                logger.error(final_message)
+                return {
+                    'status': 'failure',
+                    'message': final_message,
+                    'details': cherry_pick_results
+                }
+
         final_success_message = f'Successfully synchronized content from {source_branch} to {target_branch}.'
         logger.success(final_success_message)
         return {
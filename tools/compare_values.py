@@ -1,10 +1,18 @@
-from server import mcp
-from typing import Dict, Union
 import asyncio
+import functools
+from server import mcp
+from typing import Any, Dict, List, Optional, Union
 from logger import log as logger
 
+# Indexed by sign(value1 - value2) + 1
+_RESULT_TEMPLATES = (
+    "{} is less than {}.",
+    "{} is equal to {}.",
+    "{} is greater than {}.",
+)
+
 @mcp.tool()
-async def compare_values(value1: Union[int, float], value2: Union[int, float]) -> Dict[str, str]:
+def compare_values(value1: Union[int, float], value2: Union[int, float]) -> Dict[str, str]:
     """
     Compares two numerical values and returns the result.
 
@@ -12,13 +20,106 @@ async def compare_values(value1: Union[int, float], value2: Union[int, float]) -
     :param value2: The second numerical value for comparison.
     :return: A dictionary containing a string that describes whether the first value is greater than, less than, or equal to the second value.
     """
-    logger.info(f"Comparing values: {value1} and {value2}")
-    if value1 > value2:
-        result = f"{value1} is greater than {value2}."
-    elif value1 < value2:
-        result = f"{value1} is less than {value2}."
-    else:
-        result = f"{value1} is equal to {value2}."
+    # Input echo is debug-level with deferred formatting; the result is still reported below
+    logger.debug("Comparing values: {} and {}", value1, value2)
+    sign = (value1 > value2) - (value1 < value2)
+    result = _RESULT_TEMPLATES[sign + 1].format(value1, value2)
     
     logger.success(f"Comparison result: {result}")
     return {"comparison_result": result}
+
+# Below this many pairs a plain Python comparison is cheaper than a hop to the thread pool (and never
+# triggers the numba JIT compile), so it runs inline
+_INLINE_THRESHOLD = 1000
+
+# Largest magnitude up to which every int converts to float64 exactly
+_FLOAT64_EXACT_INT = 2 ** 53
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+@functools.lru_cache(maxsize=1)
+def _batch_kernel():
+    """
+    Returns a kernel computing sign(a - b) as int8 over two equally typed arrays, or None without numpy.
+
+    Uses a Numba-jitted loop (compiled once per dtype, cached to disk) when numba is installed,
+    otherwise falls back to vectorized NumPy. NaN pairs compare as equal, like compare_values.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        logger.debug("numpy not installed, batch comparison falls back to pure Python.")
+        return None
+
+    try:
+        from numba import njit
+    except ImportError:
+        logger.debug("numba not installed, batch comparison falls back to NumPy.")
+
+        def _compare_batch(a, b):
+            return (a > b).astype(np.int8) - (a < b).astype(np.int8)
+
+        return _compare_batch
+
+    @njit(cache=True)
+    def _compare_batch(a, b):
+        out = np.empty(a.shape, np.int8)
+        for i in range(a.size):
+            out[i] = (a[i] > b[i]) - (a[i] < b[i])
+        return out
+
+    return _compare_batch
+
+def _exact_dtype(values: List[Union[int, float]]) -> Optional[str]:
+    """
+    Picks a NumPy dtype that represents every value exactly: 'int64' for all-int input in range,
+    'float64' when every int fits in float64's 53-bit mantissa, otherwise None (compare in Python).
+    """
+    if all(type(v) is int or type(v) is bool for v in values):
+        if all(_INT64_MIN <= v <= _INT64_MAX for v in values):
+            return "int64"
+    if all(type(v) is float or -_FLOAT64_EXACT_INT <= v <= _FLOAT64_EXACT_INT for v in values):
+        return "float64"
+    return None
+
+def _compare_exact(values1: List[Union[int, float]], values2: List[Union[int, float]]) -> List[int]:
+    # Same as compare_values: Python compares int and float without rounding
+    return [(a > b) - (a < b) for a, b in zip(values1, values2)]
+
+def _compare_batches_sync(values1: List[Union[int, float]], values2: List[Union[int, float]]) -> List[int]:
+    """Synchronous element-wise comparison through the NumPy/Numba kernel; exact for every input."""
+    kernel = _batch_kernel()
+    # Both arrays must share one dtype; mixing int64 with float64 would round the ints again
+    dtype = _exact_dtype(values1 + values2) if kernel is not None else None
+    if dtype is None:
+        return _compare_exact(values1, values2)
+
+    import numpy as np
+
+    a = np.ascontiguousarray(values1, dtype=dtype)
+    b = np.ascontiguousarray(values2, dtype=dtype)
+    return kernel(a, b).tolist()
+
+@mcp.tool()
+async def compare_value_batches(values1: List[Union[int, float]], values2: List[Union[int, float]]) -> Dict[str, Any]:
+    """
+    Compares two equally sized lists of numbers element by element.
+
+    :param values1: The first list of numerical values.
+    :param values2: The second list of numerical values.
+    :return: A dictionary whose 'comparison_results' holds -1, 0 or 1 per pair (less than, equal to, greater than).
+    """
+    if len(values1) != len(values2):
+        error_msg = f"Length mismatch: {len(values1)} vs {len(values2)} values."
+        logger.error(error_msg)
+        return {"error": error_msg}
+
+    logger.info(f"Comparing {len(values1)} value pairs")
+    if len(values1) < _INLINE_THRESHOLD:
+        results = _compare_exact(values1, values2)
+    else:
+        # Large batches (and the first numba JIT compile) are CPU-bound, run in a thread
+        # to avoid blocking the event loop.
+        results = await asyncio.to_thread(_compare_batches_sync, values1, values2)
+
+    logger.success(f"Compared {len(results)} value pairs")
+    return {"comparison_results": results}
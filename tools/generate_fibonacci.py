@@ -1,8 +1,20 @@
 from server import mcp
-from typing import List
+from typing import List, Optional, Tuple
 import asyncio
+import ctypes
+import ctypes.util
+import threading
 from logger import log as logger
 
+# Memo table shared across tool calls: _FIB_CACHE[i] == F(i). Only grown up to
+# _FIB_CACHE_MAX entries so a single huge request cannot pin unbounded memory.
+_FIB_CACHE: List[int] = [0, 1]
+_FIB_CACHE_MAX = 10000
+_fib_cache_lock = threading.Lock()
+
+# Below this n the work is cheaper than a hop to the thread pool, so it runs inline
+_INLINE_THRESHOLD = 2000
+
 def _generate_fibonacci_sync(n: int) -> List[int]:
     """Synchronous implementation of Fibonacci sequence generation."""
     if n < 0:
@@ -10,13 +22,77 @@ def _generate_fibonacci_sync(n: int) -> List[int]:
     if n == 0:
         return [0] # Corrected to return a list with the number 0
     
-    sequence = []
+    if n < _FIB_CACHE_MAX:
+        with _fib_cache_lock:
+            while len(_FIB_CACHE) <= n:
+                _FIB_CACHE.append(_FIB_CACHE[-1] + _FIB_CACHE[-2])
+        return _FIB_CACHE[1:n + 1]
+
+    sequence = [0] * n
     a, b = 1, 1
-    for _ in range(n):
-        sequence.append(a)
+    for i in range(n):
+        sequence[i] = a
         a, b = b, a + b
     return sequence
 
+def _fib_pair(n: int) -> Tuple[int, int]:
+    """Returns (F(n), F(n+1)) via fast doubling in O(log n) big-int multiplications."""
+    if n == 0:
+        return (0, 1)
+    a, b = _fib_pair(n >> 1)
+    c = a * (2 * b - a)
+    d = a * a + b * b
+    return (c, d) if n & 1 == 0 else (d, c + d)
+
+class _Mpz(ctypes.Structure):
+    _fields_ = [("_mp_alloc", ctypes.c_int), ("_mp_size", ctypes.c_int), ("_mp_d", ctypes.c_void_p)]
+
+def _load_gmp():
+    """Loads libgmp through ctypes if it is installed; returns None otherwise."""
+    path = ctypes.util.find_library("gmp")
+    if not path:
+        return None
+    try:
+        lib = ctypes.CDLL(path)
+        mpz_p = ctypes.POINTER(_Mpz)
+        lib.__gmpz_init.argtypes = [mpz_p]
+        lib.__gmpz_clear.argtypes = [mpz_p]
+        lib.__gmpz_fib_ui.argtypes = [mpz_p, ctypes.c_ulong]
+        lib.__gmpz_sizeinbase.argtypes = [mpz_p, ctypes.c_int]
+        lib.__gmpz_sizeinbase.restype = ctypes.c_size_t
+        lib.__gmpz_get_str.argtypes = [ctypes.c_char_p, ctypes.c_int, mpz_p]
+        lib.__gmpz_get_str.restype = ctypes.c_char_p
+    except (OSError, AttributeError) as e:
+        logger.debug(f"libgmp unavailable, using pure-Python Fibonacci: {e}")
+        return None
+    return lib
+
+_GMP = _load_gmp()
+# Above this n GMP's mpz_fib_ui beats CPython's int multiplication by a wide margin
+_GMP_THRESHOLD = 10000
+
+def _gmp_fib(n: int) -> Optional[int]:
+    """Returns F(n) computed by libgmp, or None if GMP is not available."""
+    if _GMP is None:
+        return None
+    z = _Mpz()
+    _GMP.__gmpz_init(ctypes.byref(z))
+    try:
+        _GMP.__gmpz_fib_ui(ctypes.byref(z), n)
+        # Hex round trip: int(..., 16) is linear, unlike decimal string parsing
+        buf = ctypes.create_string_buffer(_GMP.__gmpz_sizeinbase(ctypes.byref(z), 16) + 2)
+        return int(_GMP.__gmpz_get_str(buf, 16, ctypes.byref(z)), 16)
+    finally:
+        _GMP.__gmpz_clear(ctypes.byref(z))
+
+def _fibonacci_sum_sync(n: int) -> int:
+    # F(1) + ... + F(n) == F(n+2) - 1, so the sequence itself is never materialized
+    if n >= _GMP_THRESHOLD:
+        fib = _gmp_fib(n + 2)
+        if fib is not None:
+            return fib - 1
+    return _fib_pair(n + 2)[0] - 1
+
 @mcp.tool()
 async def generate_fibonacci(n: int) -> List[int]:
     """
@@ -29,8 +105,11 @@ async def generate_fibonacci(n: int) -> List[int]:
         List[int]: 包含斐波那契数列前n个数字的列表。如果n小于等于0，则返回空列表。
     """
     logger.info(f"Generating the first {n} numbers of the Fibonacci sequence.")
-    # This is a CPU-bound operation, run in a thread to be non-blocking
-    result = await asyncio.to_thread(_generate_fibonacci_sync, n)
+    if n < _INLINE_THRESHOLD:
+        result = _generate_fibonacci_sync(n)
+    else:
+        # This is a CPU-bound operation, run in a thread to be non-blocking
+        result = await asyncio.to_thread(_generate_fibonacci_sync, n)
     logger.success(f"Successfully generated {len(result)} Fibonacci numbers.")
     return result
 
@@ -49,8 +128,12 @@ async def fibonacci_sum(n: int) -> int:
     if n <= 0:
         logger.warning("n is less than or equal to 0, returning 0.")
         return 0
-    # Since generate_fibonacci is now async, we await it.
-    sequence = await generate_fibonacci(n)
-    total = sum(sequence)
+    if n <= 2:
+        # F(1) = F(2) = 1, so the sum is n itself
+        total = n
+    elif n < _INLINE_THRESHOLD:
+        total = _fibonacci_sum_sync(n)
+    else:
+        total = await asyncio.to_thread(_fibonacci_sum_sync, n)
     logger.success(f"Sum of the first {n} Fibonacci numbers is {total}.")
     return total
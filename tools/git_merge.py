@@ -1,8 +1,12 @@
+import atexit
+import io
 import subprocess
 import json
 import os
+import re
 import httpx
 import asyncio
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional
 from pydantic import BaseModel, Field
 from logger import log as logger
@@ -11,31 +15,134 @@ from logger import log as logger
 from server import mcp
 from config import GOOGLE_API_KEY
 
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GOOGLE_API_KEY}"
+# The key travels in the x-goog-api-key header, so it never appears in URLs, logs or error messages
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+
+# Upper bound on commits per history range sent to the LLM; older history only burns tokens
+MAX_CONTEXT_COMMITS = 200
+
+# Compact JSON for the prompt and the request/response bodies: orjson when available,
+# otherwise stdlib without indentation. orjson.JSONDecodeError subclasses json.JSONDecodeError.
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _json_loads = json.loads
+
+def _compact_json(obj) -> str:
+    return _json_dumps(obj).decode("utf-8")
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+_GEMINI_HEADERS = {**_JSON_HEADERS, 'x-goog-api-key': GOOGLE_API_KEY or ''}
+
+# One conflict hunk: "ours" up to =======, "theirs" up to >>>>>>> (diff3 base sections are split off later)
+_HUNK_RE = re.compile(r'^<{7}[^\n]*\n(.*?)^={7}\n(.*?)^>{7}[^\n]*(?:\n|\Z)', re.S | re.M)
+_DIFF3_BASE_RE = re.compile(r'^\|{7}.*', re.S | re.M)
+_IMPORT_LINE_RE = re.compile(r'^\s*(?:import\s+\S|from\s+\S+\s+import\s)')
+# Any leftover conflict marker line in a resolved file; \r? covers CRLF files, where re.M's $ sits after the \r
+_MARKER_RE = re.compile(r'^(?:<{7}(?: |\r?$)|={7}\r?$|>{7}(?: |\r?$))', re.M)
+
+def _create_http_client() -> httpx.AsyncClient:
+    """Creates the shared pooled client for Gemini calls, using HTTP/2 when h2 is installed."""
+    limits = httpx.Limits(max_keepalive_connections=10)
+    try:
+        return httpx.AsyncClient(limits=limits, timeout=180, http2=True)
+    except ImportError:
+        logger.debug("h2 not installed, Gemini client falls back to HTTP/1.1.")
+        return httpx.AsyncClient(limits=limits, timeout=180)
+
+# Reused across merges so repeated resolutions skip the TCP + TLS handshake
+_HTTPX_CLIENT = _create_http_client()
+
+@atexit.register
+def _close_http_client():
+    # The event loop is gone by interpreter exit, so close the pool on a fresh one; never block shutdown
+    try:
+        asyncio.run(_HTTPX_CLIENT.aclose())
+    except Exception:
+        pass
+
+# Repositories (by real path) already confirmed to contain a .git directory
+_VALIDATED_REPOS = set()
+
+# Formatted git log output keyed by (repo, resolved range SHAs); a range resolving to the same
+# commits always yields the same history, so retries after a failed AI call skip git log
+_HISTORY_CACHE_SIZE = 32
+_history_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+def _read_text(path: str) -> str:
+    # Raw read sized by fstat, decoded once; bypasses TextIOWrapper and keeps CRLF line endings intact
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        chunks = []
+        while True:
+            chunk = os.read(fd, max(size, 1))
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    return b"".join(chunks).decode('utf-8')
+
+def _write_text(path: str, content: str):
+    # newline='' mirrors the raw read above: line endings are written back exactly as read, never translated
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
 
 class GitExecutor:
     """Handles all actual interactions with the local Git repository."""
     def __init__(self, repo_path: str):
-        if not os.path.isdir(os.path.join(repo_path, '.git')):
-            raise ValueError(f"'{repo_path}' is not a valid Git repository.")
+        real_path = os.path.realpath(repo_path)
+        if real_path not in _VALIDATED_REPOS:
+            if not os.path.isdir(os.path.join(real_path, '.git')):
+                raise ValueError(f"'{repo_path}' is not a valid Git repository.")
+            _VALIDATED_REPOS.add(real_path)
         self.repo_path = repo_path
+        self.current_branch: Optional[str] = None
+        # Set when a clean trial merge was left staged for finalize_clean_merge to commit
+        self.merge_in_progress = False
 
-    async def _run_git_command(self, command: List[str], check: bool = True) -> str:
-        """Asynchronously executes a git command."""
+    async def _run_git_process(self, command: List[str], input: Optional[bytes] = None) -> Tuple[int, bytes, bytes]:
+        """Asynchronously executes a git command, optionally feeding `input` to stdin, and returns (returncode, stdout, stderr)."""
         logger.debug(f"Running git command: {' '.join(command)}")
         process = await asyncio.create_subprocess_exec(
             *command,
             cwd=self.repo_path,
+            stdin=asyncio.subprocess.PIPE if input is not None else None,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE
         )
-        stdout, stderr = await process.communicate()
-        if check and process.returncode != 0:
+        stdout, stderr = await process.communicate(input)
+        return process.returncode, stdout, stderr
+
+    async def _run_git_command(self, command: List[str], check: bool = True, input: Optional[bytes] = None) -> str:
+        """Asynchronously executes a git command."""
+        returncode, stdout, stderr = await self._run_git_process(command, input)
+        if check and returncode != 0:
             error_message = f"Git command failed: {stderr.decode()}"
             logger.error(error_message)
             raise RuntimeError(error_message)
         return stdout.decode().strip()
 
+    async def verify_branch(self, source_branch: str) -> str:
+        """Verifies that the source branch exists and returns (and caches) the current branch name in one git call."""
+        # rev-parse prints the current branch first and fails if any revision is unknown
+        stdout = await self._run_git_command(['git', 'rev-parse', '--abbrev-ref', 'HEAD', source_branch, '--'])
+        self.current_branch = stdout.splitlines()[0]
+        return self.current_branch
+
+    async def get_current_branch(self) -> str:
+        """Returns the current branch name, reusing the value cached by verify_branch."""
+        if self.current_branch is None:
+            self.current_branch = await self._run_git_command(['git', 'rev-parse', '--abbrev-ref', 'HEAD'])
+        return self.current_branch
+
     async def check_for_conflicts(self, source_branch: str) -> Tuple[bool, List[str]]:
         """Performs a 'dry run' merge to check for conflicts."""
         logger.info(f"Checking for conflicts by attempting a test merge of '{source_branch}'...")
@@ -43,10 +150,28 @@ class GitExecutor:
         if status:
             raise RuntimeError("Working directory is not clean. Please commit or stash your changes.")
 
+        # Compute the merge in memory: exit code 0 means clean, 1 means conflicts, with the
+        # result tree on the first line followed by the conflicted paths
+        returncode, stdout, stderr = await self._run_git_process(
+            ['git', 'merge-tree', '--write-tree', '--name-only', '--no-messages', 'HEAD', source_branch]
+        )
+        if returncode == 0:
+            logger.info("No conflicts detected.")
+            return False, []
+        if returncode == 1:
+            conflicted_files = stdout.decode().splitlines()[1:]
+            logger.info(f"Conflicts detected. Conflicted files: {conflicted_files}")
+            # Start the real merge so the worktree holds the conflict markers for the resolver
+            await self._run_git_command(['git', 'merge', '--no-commit', '--no-ff', source_branch], check=False)
+            return True, conflicted_files
+
+        # git older than 2.38 has no merge-tree --write-tree; fall back to a trial merge
+        logger.debug(f"git merge-tree unavailable ({stderr.decode().strip()}), falling back to a test merge.")
         try:
             await self._run_git_command(['git', 'merge', '--no-commit', '--no-ff', source_branch])
-            logger.info("No conflicts detected. Aborting test merge.")
-            await self._run_git_command(['git', 'merge', '--abort'])
+            # Keep the clean trial merge staged instead of aborting and merging a second time
+            logger.info("No conflicts detected. Leaving the test merge staged for commit.")
+            self.merge_in_progress = True
             return False, []
         except RuntimeError:
             logger.info("Conflicts detected.")
@@ -59,8 +184,8 @@ class GitExecutor:
         """Gets the content of a file with conflict markers."""
         full_path = os.path.join(self.repo_path, file_path)
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            # Read in a worker thread so large files don't stall the event loop
+            return await asyncio.to_thread(_read_text, full_path)
         except Exception as e:
             logger.error(f"Could not read file {file_path}: {e}")
             return f"ERROR: Could not read file {file_path}: {e}"
@@ -68,12 +193,17 @@ class GitExecutor:
     async def apply_ai_solution_and_commit(self, source_branch: str, resolved_files: Dict[str, str]) -> str:
         """Applies the AI-generated solution and creates the merge commit."""
         logger.info("Applying AI-generated solution...")
-        for file_path, content in resolved_files.items():
-            full_path = os.path.join(self.repo_path, file_path)
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            logger.info(f"Applied solution to {file_path}")
-            await self._run_git_command(['git', 'add', file_path])
+        # Write all files concurrently off the event loop, then stage them with a single git add
+        await asyncio.gather(*(
+            asyncio.to_thread(_write_text, os.path.join(self.repo_path, file_path), content)
+            for file_path, content in resolved_files.items()
+        ))
+        logger.info(f"Applied solution to {list(resolved_files)}")
+        # Paths go through stdin NUL-separated, so any number of files (or odd names) fit in one git add
+        await self._run_git_command(
+            ['git', 'add', '--pathspec-from-file=-', '--pathspec-file-nul'],
+            input=b"\0".join(path.encode() for path in resolved_files)
+        )
 
         commit_message = f"Merge branch '{source_branch}' with AI-assisted conflict resolution"
         logger.info(f"Committing merge with message: \"{commit_message}\"")
@@ -84,7 +214,9 @@ class GitExecutor:
     async def finalize_clean_merge(self, source_branch: str) -> str:
         """Handles a conflict-free merge by creating the merge commit."""
         logger.info("Finalizing clean merge...")
-        await self._run_git_command(['git', 'merge', '--no-ff', source_branch], check=False)
+        if not self.merge_in_progress:
+            await self._run_git_command(['git', 'merge', '--no-ff', source_branch], check=False)
+        self.merge_in_progress = False
         commit_message = f"Merge branch '{source_branch}'"
         await self._run_git_command(['git', 'commit', '-m', commit_message], check=False)
         logger.success("Clean merge completed.")
@@ -93,13 +225,14 @@ class GitExecutor:
     async def abort_merge(self):
         """Aborts the current merge process."""
         logger.warning("Aborting merge process...")
+        self.merge_in_progress = False
         await self._run_git_command(['git', 'merge', '--abort'])
         logger.info("Merge aborted. Working directory restored.")
 
 class GitContextExtractor:
     """Extracts context from the local repository for the AI."""
-    def __init__(self, repo_path: str):
-        self.executor = GitExecutor(repo_path)
+    def __init__(self, repo_path: str, executor: Optional[GitExecutor] = None):
+        self.executor = executor or GitExecutor(repo_path)
 
     async def extract_commit_history(self, commit_range: str) -> str:
         """Extracts commit history for a given range."""
@@ -109,7 +242,22 @@ class GitContextExtractor:
         
         log_format = "Commit: %H%nAuthor: %an%nDate: %ad%nSubject: %s%nBody: %b%n--GIT-LOG-END--"
         try:
-            return await self.executor._run_git_command(['git', 'log', f'--pretty=format:{log_format}', commit_range])
+            # Resolving the range boundaries is much cheaper than formatting the log
+            resolved = await self.executor._run_git_command(['git', 'rev-parse', commit_range, '--'])
+            cache_key = (os.path.realpath(self.executor.repo_path), resolved)
+            cached = _history_cache.get(cache_key)
+            if cached is not None:
+                _history_cache.move_to_end(cache_key)
+                logger.info(f"Using cached history for range '{commit_range}'.")
+                return cached
+
+            history = await self.executor._run_git_command(
+                ['git', 'log', f'--max-count={MAX_CONTEXT_COMMITS}', f'--pretty=format:{log_format}', commit_range]
+            )
+            _history_cache[cache_key] = history
+            if len(_history_cache) > _HISTORY_CACHE_SIZE:
+                _history_cache.popitem(last=False)
+            return history
         except RuntimeError as e:
             logger.warning(f"Could not extract git log for range '{commit_range}'. Error: {e}")
             return f"Error extracting log for range '{commit_range}'."
@@ -117,13 +265,18 @@ class GitContextExtractor:
     async def extract_context_for_conflict(self, source_branch: str, context_commits: Optional[str]) -> Dict:
         """Extracts the full context for conflict resolution."""
         logger.info("Extracting context for AI resolver...")
-        current_branch = await self.executor._run_git_command(['git', 'rev-parse', '--abbrev-ref', 'HEAD'])
+        # The three lookups are read-only and independent (HEAD..source equals current..source), so run them concurrently
+        current_branch, target_context, source_context = await asyncio.gather(
+            self.executor.get_current_branch(),
+            self.extract_commit_history(context_commits),
+            self.extract_commit_history(f"HEAD..{source_branch}")
+        )
         
         return {
             "target_branch": current_branch,
             "source_branch": source_branch,
-            "target_branch_context": await self.extract_commit_history(context_commits),
-            "source_branch_context": await self.extract_commit_history(f"{current_branch}..{source_branch}")
+            "target_branch_context": target_context,
+            "source_branch_context": source_context
         }
 
 class AIResolver:
@@ -135,31 +288,119 @@ class AIResolver:
         # This is a placeholder. A real implementation would be much more complex.
         prompt = f"""
         You are an expert Git merge conflict resolver. Resolve the conflicts in the following files.
-        Context: {json.dumps(context_data, indent=2)}
-        Conflicted files: {json.dumps(conflicted_files_data, indent=2)}
+        Context: {_compact_json(context_data)}
+        Conflicted files: {_compact_json(conflicted_files_data)}
         Respond with a JSON object with a single key "resolved_files", which is a list of objects, each with "file_path" and "resolved_content".
         """
         return prompt
     
+    @staticmethod
+    def _import_bindings(line: str) -> List[str]:
+        """Names bound by a single-line import statement."""
+        stmt = line.split('#', 1)[0].strip()
+        if stmt.startswith('from '):
+            names = stmt.split(' import ', 1)[1].strip('() ').split(',')
+        else:
+            names = stmt[len('import '):].split(',')
+        bound = []
+        for name in names:
+            parts = name.split()
+            if not parts:
+                continue
+            if len(parts) == 3 and parts[1] == 'as':
+                bound.append(parts[2])
+            else:
+                bound.append(parts[0].split('.')[0])
+        return bound
+
+    @classmethod
+    def _resolve_hunk(cls, ours: str, theirs: str, is_python: bool) -> Optional[str]:
+        """Resolves a hunk that differs only in trailing whitespace or only by added imports; None if it needs the LLM."""
+        base_match = _DIFF3_BASE_RE.search(ours)
+        if base_match:
+            base = base_match.group(0).split('\n', 1)[1] if '\n' in base_match.group(0) else ''
+            ours = ours[:base_match.start()]
+        else:
+            base = None
+        # Leading indentation and inner spacing are significant (Python blocks, string literals)
+        if [line.rstrip() for line in ours.splitlines()] == [line.rstrip() for line in theirs.splitlines()]:
+            return ours
+        # Import union needs the diff3 base to prove neither side deleted an import
+        if not is_python or base is None:
+            return None
+        ours_lines = [line.rstrip() for line in ours.splitlines() if line.strip()]
+        theirs_lines = [line.rstrip() for line in theirs.splitlines() if line.strip()]
+        base_lines = [line.rstrip() for line in base.splitlines() if line.strip()]
+        all_lines = ours_lines + theirs_lines + base_lines
+        if not all(_IMPORT_LINE_RE.match(line) and not line.endswith('\\') for line in all_lines):
+            return None
+        if not set(base_lines) <= set(ours_lines) & set(theirs_lines):
+            return None
+        merged = list(dict.fromkeys(ours_lines + theirs_lines))
+        # Two different imports binding the same name would silently shadow one another
+        owners = {}
+        for line in merged:
+            for name in cls._import_bindings(line):
+                if owners.setdefault(name, line) != line:
+                    return None
+        return ''.join(line + '\n' for line in merged)
+
+    def _resolve_locally(self, file_path: str, content: str) -> Optional[str]:
+        """Resolves every hunk of a file locally, or returns None if any hunk is non-trivial."""
+        unresolved = False
+        is_python = file_path.endswith('.py')
+
+        def _replace(match: "re.Match") -> str:
+            nonlocal unresolved
+            resolved = self._resolve_hunk(match.group(1), match.group(2), is_python)
+            if resolved is None:
+                unresolved = True
+                return match.group(0)
+            return resolved
+
+        resolved_content = _HUNK_RE.sub(_replace, content)
+        if unresolved or resolved_content == content:
+            return None
+        return resolved_content
+
     async def resolve_conflicts(self, context_data: Dict, conflicted_files_data: Dict[str, str]) -> Dict[str, str]:
+        """Resolves trivial conflicts locally and calls the LLM API only for the remaining files."""
+        resolved_files_dict = {}
+        remaining_files = {}
+        for file_path, content in conflicted_files_data.items():
+            resolved = self._resolve_locally(file_path, content)
+            if resolved is None:
+                remaining_files[file_path] = content
+            else:
+                resolved_files_dict[file_path] = resolved
+        if resolved_files_dict:
+            logger.info(f"Resolved whitespace/import-only conflicts locally: {list(resolved_files_dict)}")
+        if remaining_files:
+            resolved_files_dict.update(await self._resolve_with_llm(context_data, remaining_files))
+
+        # Never hand content that still carries conflict markers to the writer
+        unresolved = [path for path, content in resolved_files_dict.items() if _MARKER_RE.search(content)]
+        if unresolved:
+            raise RuntimeError(f"Resolved content still contains conflict markers: {unresolved}")
+        return resolved_files_dict
+
+    async def _resolve_with_llm(self, context_data: Dict, conflicted_files_data: Dict[str, str]) -> Dict[str, str]:
         """Calls the LLM API to resolve conflicts."""
         logger.info("Building prompt and calling AI to resolve conflicts...")
         prompt = self._build_prompt(context_data, conflicted_files_data)
         
-        headers = {'Content-Type': 'application/json'}
         payload = {
             "contents": [{"role": "user", "parts": [{"text": prompt}]}],
             "generationConfig": {"responseMimeType": "application/json", "temperature": 0.2}
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(GEMINI_API_URL, headers=headers, json=payload, timeout=180)
+            response = await _HTTPX_CLIENT.post(GEMINI_API_URL, headers=_GEMINI_HEADERS, content=_json_dumps(payload))
             response.raise_for_status()
-            result = response.json()
+            result = _json_loads(response.content)
             
             content_text = result["candidates"][0]["content"]["parts"][0]["text"]
-            resolved_data = json.loads(content_text)
+            resolved_data = _json_loads(content_text)
             resolved_files_list = resolved_data.get("resolved_files", [])
             resolved_files_dict = {item["file_path"]: item["resolved_content"] for item in resolved_files_list}
             
@@ -180,40 +421,41 @@ async def ai_assisted_merge(source_branch: str, context_commits: Optional[str] =
     AI-assisted merge tool. Merges the source branch into the current branch, using an AI to resolve conflicts if they arise.
     """
     repo_path = "."
-    logs = [f"===== Starting AI-assisted merge for branch '{source_branch}' ====="]
+    logs = io.StringIO()
+    print(f"===== Starting AI-assisted merge for branch '{source_branch}' =====", file=logs)
     git_executor = GitExecutor(repo_path)
 
     try:
         logger.info("Performing pre-checks...")
-        await git_executor._run_git_command(['git', 'rev-parse', '--verify', source_branch])
+        await git_executor.verify_branch(source_branch)
         logger.info(f"Source branch '{source_branch}' exists.")
 
         has_conflicts, conflicted_files = await git_executor.check_for_conflicts(source_branch)
 
         if not has_conflicts:
             commit_hash = await git_executor.finalize_clean_merge(source_branch)
-            logs.append(f"SUCCESS: Clean merge completed. New commit hash: {commit_hash}")
+            print(f"SUCCESS: Clean merge completed. New commit hash: {commit_hash}", file=logs)
             logger.success(f"Clean merge completed. New commit hash: {commit_hash}")
         else:
             logger.info("Conflicts detected. Starting AI resolution workflow.")
-            context_extractor = GitContextExtractor(repo_path)
+            context_extractor = GitContextExtractor(repo_path, git_executor)
             ai_resolver = AIResolver()
 
             context_data = await context_extractor.extract_context_for_conflict(source_branch, context_commits)
             
-            conflicted_content = {
-                file: await git_executor.get_file_content_with_markers(file)
-                for file in conflicted_files
-            }
+            contents = await asyncio.gather(
+                *(git_executor.get_file_content_with_markers(file) for file in conflicted_files)
+            )
+            conflicted_content = dict(zip(conflicted_files, contents))
 
             ai_solution = await ai_resolver.resolve_conflicts(context_data, conflicted_content)
             commit_hash = await git_executor.apply_ai_solution_and_commit(source_branch, ai_solution)
-            logs.append(f"SUCCESS: AI-assisted merge completed. New commit hash: {commit_hash}")
+            print(f"SUCCESS: AI-assisted merge completed. New commit hash: {commit_hash}", file=logs)
             logger.success(f"AI-assisted merge completed. New commit hash: {commit_hash}")
 
     except (RuntimeError, ValueError) as e:
         error_msg = f"ERROR: Merge process failed: {e}"
-        logs.append(f"\n{error_msg}")
+        print(f"\n{error_msg}", file=logs)
         logger.error(error_msg)
         
         logger.info("Attempting to clean up by aborting any pending merge...")
@@ -221,10 +463,10 @@ async def ai_assisted_merge(source_branch: str, context_commits: Optional[str] =
             await git_executor.abort_merge()
         except RuntimeError as abort_e:
             abort_error_msg = f"ERROR: Failed to abort merge. Manual cleanup may be required. Error: {abort_e}"
-            logs.append(abort_error_msg)
+            print(abort_error_msg, file=logs)
             logger.critical(abort_error_msg)
     finally:
-        logs.append("===== AI-assisted merge process finished =====")
+        print("===== AI-assisted merge process finished =====", file=logs)
         logger.info("===== AI-assisted merge process finished =====")
     
-    return "\n".join(logs)
+    return logs.getvalue().rstrip("\n")
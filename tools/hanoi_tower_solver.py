@@ -2,22 +2,49 @@ from pydantic import BaseModel
 from typing import List
 from server import mcp  # 确保引用的是 server.py 中的实例
 import asyncio
+import functools
 from logger import log as logger
 
 class HanoiTowerArgs(BaseModel):
     """汉诺塔问题的参数"""
     num_disks: int
 
+_STEP_TEMPLATE = "将盘 {} 从 {} 移动到 {}"
+
+# 层数不超过该值时（最多 4095 步）整段答案缓存在内存中，重复调用直接返回
+_CACHED_MAX_DISKS = 12
+
 def _solve_hanoi_tower_sync(num_disks: int, source: str, destination: str, auxiliary: str) -> List[str]:
     """解决汉诺塔问题，返回每一步的移动步骤。"""
-    if num_disks == 1:
-        return [f"将盘 1 从 {source} 移动到 {destination}"]
-    
-    steps = _solve_hanoi_tower_sync(num_disks - 1, source, auxiliary, destination)
-    steps.append(f"将盘 {num_disks} 从 {source} 移动到 {destination}")
-    steps.extend(_solve_hanoi_tower_sync(num_disks - 1, auxiliary, destination, source))
+    # 迭代解法：第 i 步（从 1 开始）移动的盘号 k 是 i 末尾 0 的个数 + 1，起止柱分别为
+    # (i & (i-1)) % 3 和 ((i | (i-1)) + 1) % 3；n 为奇数时塔从 0 号柱移到 2 号柱，偶数时移到 1 号柱。
+    # 第 k 号盘的第 j 次移动出现在 i = (2j+1) << (k-1)，其起止柱以 3 为周期循环，
+    # 所以每个盘只需预先格式化 3 条步骤字符串，主循环只做整数运算和查表。
+    if num_disks % 2:
+        pegs = (source, auxiliary, destination)
+    else:
+        pegs = (source, destination, auxiliary)
+
+    moves = [None]
+    for k in range(1, num_disks + 1):
+        cycle = []
+        for j in range(3):
+            i = (2 * j + 1) << (k - 1)
+            cycle.append(_STEP_TEMPLATE.format(k, pegs[(i & (i - 1)) % 3], pegs[((i | (i - 1)) + 1) % 3]))
+        moves.append(cycle)
+
+    total = (1 << num_disks) - 1
+    steps = [None] * total
+    for i in range(1, total + 1):
+        k = (i & -i).bit_length()
+        steps[i - 1] = moves[k][(i >> k) % 3]
     return steps
 
+@functools.lru_cache(maxsize=_CACHED_MAX_DISKS)
+def _cached_solution(num_disks: int) -> str:
+    """返回小规模汉诺塔（A -> C，借助 B）的完整解答文本，并按层数缓存。"""
+    return "\n".join(_solve_hanoi_tower_sync(num_disks, "A", "C", "B"))
+
 @mcp.tool()
 async def hanoi_tower_solver(num_disks: int) -> str:
     """
@@ -31,7 +58,11 @@ async def hanoi_tower_solver(num_disks: int) -> str:
         logger.warning(f"Invalid input for hanoi_tower_solver: {num_disks}. Returning error message.")
         return error_msg
     
-    # This is a CPU-bound operation, run in a thread to be non-blocking
-    steps = await asyncio.to_thread(_solve_hanoi_tower_sync, num_disks, "A", "C", "B")
-    logger.success(f"Successfully generated {len(steps)} steps for {num_disks}-disk Tower of Hanoi.")
-    return "\n".join(steps)
+    if num_disks <= _CACHED_MAX_DISKS:
+        result = _cached_solution(num_disks)
+    else:
+        # This is a CPU-bound operation, run in a thread to be non-blocking
+        steps = await asyncio.to_thread(_solve_hanoi_tower_sync, num_disks, "A", "C", "B")
+        result = "\n".join(steps)
+    logger.success(f"Successfully generated {(1 << num_disks) - 1} steps for {num_disks}-disk Tower of Hanoi.")
+    return result
@@ -1,7 +1,8 @@
-import uuid
 import asyncio
+import functools
 import socket
 from pathlib import Path
+from secrets import token_hex
 from typing import Dict, Any, List, Optional
 
 from pydantic import BaseModel, Field
@@ -10,6 +11,15 @@ from logger import log as logger
 # 从 server.py 导入共享的 mcp 实例
 from server import mcp
 
+# --- Markdown 片段常量 ---
+_MERMAID_TOKEN = "```mermaid"
+_MERMAID_PLUGIN = "\nplugins:\n  - mermaid"
+_SLIDE_OPEN = "<slide>\n"
+_SLIDE_CLOSE = "\n</slide>"
+_SLIDE_SEPARATOR = "\n\n"
+_NOTE_OPEN = "\n\n<note>\n"
+_NOTE_CLOSE = "\n</note>"
+
 # --- Pydantic Models ---
 class Slide(BaseModel):
     title: Optional[str] = Field(None, description="幻灯片的可选标题。")
@@ -27,8 +37,9 @@ class ServePresentationArgs(BaseModel):
     port: int = Field(8080, description="用户本地启动服务的端口。")
 
 
+@functools.lru_cache(maxsize=1)
 def _get_local_ip():
-    """获取本机的局域网IP地址"""
+    """获取本机的局域网IP地址（进程内缓存，只探测一次）"""
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         # 不需要真正发送数据
@@ -47,36 +58,35 @@ async def generate_nodeppt_markdown(args: GenerateMarkdownArgs) -> Dict[str, Any
     生成 NodePPT 演示文稿的 Markdown 内容。
     此工具仅生成 Markdown 文本，不写入文件，以便客户端可以在本地保存。
     """
-    async def _generate_content(data: GenerateMarkdownArgs) -> str:
-        metadata_lines = [f"title: {data.title}"]
+    def _generate_content(data: GenerateMarkdownArgs) -> str:
+        # 所有片段按顺序追加到同一个扁平列表中，最后只做一次 join
+        parts: List[str] = ["title: ", data.title]
         if data.author:
-            metadata_lines.append(f"author: {data.author}")
+            parts.extend(("\nauthor: ", data.author))
         
-        full_content_for_check = "".join(s.content for s in data.slides)
-        if "```mermaid" in full_content_for_check:
-            metadata_lines.append("plugins:\n  - mermaid")
-            
-        metadata_section = "\n".join(metadata_lines)
+        if any(_MERMAID_TOKEN in s.content for s in data.slides):
+            parts.append(_MERMAID_PLUGIN)
+        parts.append(_SLIDE_SEPARATOR)
 
-        slides_markdown = []
         for slide in data.slides:
-            slide_header = f"## {slide.title}\n\n" if slide.title else ""
-            slide_notes = f"<note>\n{slide.notes}\n</note>" if slide.notes else ""
-            
-            full_slide_content = f"{slide_header}{slide.content}"
-            if slide_notes:
-                full_slide_content += f"\n\n{slide_notes}"
-            
-            slides_markdown.append(f"<slide>\n{full_slide_content}\n</slide>")
-        slides_section = "\n\n".join(slides_markdown)
+            parts.append(_SLIDE_OPEN)
+            if slide.title:
+                parts.extend(("## ", slide.title, "\n\n"))
+            parts.append(slide.content)
+            if slide.notes:
+                parts.extend((_NOTE_OPEN, slide.notes, _NOTE_CLOSE))
+            parts.extend((_SLIDE_CLOSE, _SLIDE_SEPARATOR))
+        if data.slides:
+            # 去掉最后一张幻灯片后多余的分隔符
+            parts.pop()
         
-        return f"{metadata_section}\n\n{slides_section}"
+        return "".join(parts)
 
     try:
-        markdown_content = await _generate_content(args)
+        markdown_content = _generate_content(args)
         
         # 生成一个建议的文件名，但不创建文件
-        suggested_filename = f"presentation_{uuid.uuid4().hex}.md"
+        suggested_filename = f"presentation_{token_hex(8)}.md"
         
         logger.info(f"成功生成 NodePPT Markdown 内容，建议文件名: {suggested_filename}")
         return {
@@ -89,6 +99,14 @@ async def generate_nodeppt_markdown(args: GenerateMarkdownArgs) -> Dict[str, Any
         logger.error(f"生成 Markdown 内容时出错: {e}")
         return {"success": False, "error": f"生成 Markdown 内容时出错: {e}"}
 
+@mcp.tool()
+async def generate_nodeppt_markdown_batch(args_list: List[GenerateMarkdownArgs]) -> List[Dict[str, Any]]:
+    """
+    批量生成多份 NodePPT 演示文稿的 Markdown 内容，一次调用即可完成多个章节。
+    返回结果与输入顺序一一对应，单份失败不影响其余结果。
+    """
+    return list(await asyncio.gather(*(generate_nodeppt_markdown(a) for a in args_list)))
+
 @mcp.tool()
 async def serve_nodeppt_presentation(args: ServePresentationArgs) -> Dict[str, Any]:
     """